@@ -1,27 +1,113 @@
 # app.py
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort, g, has_request_context
 from flask_cors import CORS
-from pymongo import MongoClient
+from werkzeug.middleware.proxy_fix import ProxyFix
+import os
 import subprocess
-import ipaddress
-from threading import Thread
+import time
+from threading import Thread, Lock
 import uuid
 import json
 
+from schema import (
+    validate_create_request,
+    validate_upgrade_request,
+    validate_delete_request,
+    validate_cluster_name_request,
+    validate_scale_request,
+)
+import idempotency
+import ratelimit
+import inventory
+import health
+import joblog
+import factcache
+import recap
+import preflight
+import batching
+
 app = Flask(__name__)
 CORS(app)
 
+# X-Forwarded-For is only trusted for this many proxy hops in front of the app; with 0
+# (the default) the client address is the peer address, which callers cannot forge
+TRUSTED_PROXY_HOPS = int(os.environ.get('KMS_TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
 # Global variables
 cluster_creation_status = {'status': 'pending', 'message': 'Cluster creation in progress'}
 upgrade_status = {'status': 'pending', 'message': 'Cluster upgrade in progress'}
 latest_valid_request_id = None
 clusters_info = {}
 ansible_playbook_response = None
+# Only the end of a job's output is kept in memory, for the nodes summary; the full log is in joblog
+SUMMARY_TAIL_BYTES = 1024 * 1024
+ERROR_TAIL_BYTES = 8 * 1024
+active_jobs = 0
+active_jobs_lock = Lock()
+# cluster_name -> {inventory hostname: 'clean' | 'failed'} for teardowns in progress
+teardown_progress = {}
+teardown_lock = Lock()
+TEARDOWN_MAX_FORKS = int(os.environ.get('KMS_TEARDOWN_MAX_FORKS', 100))
+
+# MongoDB configuration; the client is created on first use so that an
+# unavailable database does not hold up startup
+MONGODB_URL = os.environ.get('MONGODB_URL', 'mongodb://172.31.89.139:27017/')
+MONGODB_TIMEOUT_MS = int(os.environ.get('KMS_MONGODB_TIMEOUT_MS', 2000))
+DB_HEALTH_CACHE_SECONDS = 5
+mongo_db = None
+mongo_db_lock = Lock()
+db_health = {'status': 'unknown', 'checked_at': None}
+db_health_thread = None
+
+def get_collection(name):
+    """
+    Return a MongoDB collection, connecting lazily on first use.
+
+    Parameters:
+    - name (str): Name of the collection in cluster_db.
+
+    Returns:
+    - Collection: pymongo collection handle.
+    """
+    global mongo_db
+    if mongo_db is None:
+        with mongo_db_lock:
+            if mongo_db is None:
+                from pymongo import MongoClient
 
-# MongoDB configuration
-client = MongoClient('mongodb://172.31.89.139:27017/')
-db = client['cluster_db']
-clusters_collection = db['clusters']
+                client = MongoClient(MONGODB_URL, connect=False, serverSelectionTimeoutMS=MONGODB_TIMEOUT_MS)
+                mongo_db = client['cluster_db']
+    return mongo_db[name]
+
+def check_db_health():
+    """
+    Ping MongoDB, reusing the last result for a few seconds so probes stay cheap.
+    """
+    global db_health
+    if db_health['checked_at'] and time.monotonic() - db_health['checked_at'] < DB_HEALTH_CACHE_SECONDS:
+        return db_health
+    try:
+        get_collection('clusters').database.client.admin.command('ping')
+        db_health = {'status': 'ok', 'checked_at': time.monotonic()}
+    except Exception as e:
+        db_health = {'status': 'unavailable', 'message': str(e), 'checked_at': time.monotonic()}
+    return db_health
+
+def watch_db_health():
+    while True:
+        check_db_health()
+        time.sleep(DB_HEALTH_CACHE_SECONDS)
+
+def start_db_health_watcher():
+    """
+    Keep db_health fresh in the background, so /readyz can report it without blocking on MongoDB.
+    """
+    global db_health_thread
+    if db_health_thread is None:
+        db_health_thread = Thread(target=watch_db_health, daemon=True)
+        db_health_thread.start()
 
 def get_cluster_info(cluster_name):
     """
@@ -33,7 +119,24 @@ def get_cluster_info(cluster_name):
     Returns:
     - dict: Cluster information or None if not found.
     """
-    return clusters_collection.find_one({'cluster_name': cluster_name})
+    return get_collection('clusters').find_one({'cluster_name': cluster_name})
+
+def cluster_host_names(cluster_info):
+    """
+    Return the inventory hostnames pinned for a cluster's nodes, as {ip: name}.
+
+    Records from before IP-derived hostnames (no host_names and no group_vars)
+    get their positional names pinned on first use, from the stored IP order.
+    """
+    if not cluster_info:
+        return {}
+    if 'host_names' not in cluster_info:
+        host_names = {}
+        if 'group_vars' not in cluster_info:
+            host_names = inventory.legacy_host_names(cluster_info.get('master_ips') or [], cluster_info.get('worker_ips') or [])
+        get_collection('clusters').update_one({'cluster_name': cluster_info['cluster_name']}, {'$set': {'host_names': host_names}})
+        cluster_info['host_names'] = host_names
+    return cluster_info['host_names'] or {}
 
 def save_cluster_info(cluster_name, request_id):
     """
@@ -43,165 +146,506 @@ def save_cluster_info(cluster_name, request_id):
     - cluster_name (str): Name of the cluster.
     - request_id (str): Unique identifier for the cluster creation request.
     """
-    clusters_collection.insert_one({'cluster_name': cluster_name, 'request_id': request_id})
-
-
-def generate_inventory(master_ips, worker_ips):
-    inventory_content = "[masters]\n"
-    inventory_content += "\n".join([f"master-{i} ansible_host={ip} rke2_type=server" for i, ip in enumerate(master_ips, 1)])
-
-    inventory_content += "\n\n[workers]\n"
-    inventory_content += "\n".join([f"worker-{i} ansible_host={ip} rke2_type=agent" for i, ip in enumerate(worker_ips, 1)])
+    get_collection('clusters').insert_one({'cluster_name': cluster_name, 'request_id': request_id})
 
-    inventory_content += "\n\n[k8s_cluster:children]\n"
-    inventory_content += "masters\nworkers"
 
-    return inventory_content
+def run_logged_command(ansible_command, request_id, env=None, on_output_line=None):
+    """
+    Run a command, streaming its output into the job's compressed log.
+    on_output_line, when given, is called with every decoded line as it arrives.
 
-def run_ansible_playbook(ansible_command):
-    global cluster_creation_status, upgrade_status, ansible_playbook_response
+    Raises:
+    - subprocess.CalledProcessError: With the tail of the log as output when the command fails.
+    """
+    with joblog.JobLogWriter(request_id) as log_writer:
+        process = subprocess.Popen(ansible_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+        for line in process.stdout:
+            log_writer.write(line)
+            if on_output_line:
+                on_output_line(line.decode(errors='replace'))
+        returncode = process.wait()
+    joblog.enforce_retention()
+
+    if returncode != 0:
+        output = joblog.read_tail(request_id, ERROR_TAIL_BYTES).decode(errors='replace')
+        raise subprocess.CalledProcessError(returncode, ansible_command, output=output)
+    return joblog.read_tail(request_id, SUMMARY_TAIL_BYTES).decode(errors='replace')
+
+def run_ansible_playbook(ansible_command, request_id, on_complete=None, env=None, on_output_line=None):
+    global cluster_creation_status, upgrade_status, ansible_playbook_response, active_jobs
+    succeeded = False
     try:
-        output = subprocess.check_output(ansible_command, stderr=subprocess.STDOUT, text=True)
+        output = run_logged_command(ansible_command, request_id, env, on_output_line)
         cluster_creation_status = {'status': 'success', 'message': 'Cluster creation successful'}
         upgrade_status = {'status': 'success', 'message': 'Cluster upgrade successful'}
         ansible_playbook_response = output
+        succeeded = True
     except subprocess.CalledProcessError as e:
-        error_message = f'Cluster creation or upgrade failed: {str(e)}'
+        error_message = f'Cluster creation or upgrade failed: {str(e)} Full log: /api/jobs/{request_id}/log'
         if e.output is not None:
             error_message += f'\n{e.output}'
         cluster_creation_status = {'status': 'internal error', 'message': error_message}
         upgrade_status = {'status': 'internal error', 'message': error_message}
         ansible_playbook_response = None
+    finally:
+        with active_jobs_lock:
+            active_jobs -= 1
+        if on_complete:
+            on_complete(succeeded)
+
+def take_reserved_job_slot():
+    """
+    Hand the job slot reserved at admission over to the job being started.
+
+    Returns:
+    - bool: True if the current request held a slot, which the job now owns.
+    """
+    return has_request_context() and g.pop('reserved_job_slot', False)
+
+def start_ansible_playbook(ansible_command, request_id, on_complete=None, env=None, on_output_line=None):
+    global active_jobs
+    if not take_reserved_job_slot():
+        with active_jobs_lock:
+            active_jobs += 1
+    Thread(target=run_ansible_playbook, args=(ansible_command, request_id, on_complete, env, on_output_line)).start()
+
+def run_batch(jobs):
+    """
+    Run several small create/upgrade jobs in a single ansible-playbook invocation.
+
+    Every job's log is linked to the shared batch log, and each job's outcome
+    is read from its own hosts in the PLAY RECAP. Jobs whose play never ran
+    are started again on their own rather than failed.
+
+    The clusters are deployed one after another, so a batch holds a single
+    active job slot for its whole run, however many clusters it carries.
+    """
+    global cluster_creation_status, upgrade_status, ansible_playbook_response, active_jobs
+    with active_jobs_lock:
+        active_jobs += 1
+    if len(jobs) == 1:
+        job = jobs[0]
+        run_ansible_playbook(job['ansible_command'], job['request_id'], job['on_complete'], job['env'])
+        return
+
+    batch_id = f'batch-{uuid.uuid4()}'
+    results = {}
+    output = None
+    try:
+        for job in jobs:
+            joblog.link_log(job['request_id'], batch_id)
+        inventory_path, playbook_path = batching.write_batch(batch_id, jobs)
+        cache_dirs = {job['env']['ANSIBLE_CACHE_PLUGIN_CONNECTION']: [] for job in jobs}
+        for job in jobs:
+            cache_dirs[job['env']['ANSIBLE_CACHE_PLUGIN_CONNECTION']].extend(
+                inventory.host_name(ip, job['host_names']) for ip in job['master_ips'] + job['worker_ips'])
+        batch_cache_dir = factcache.seed_batch_cache(batch_id, cache_dirs)
+        env = factcache.cache_env(batch_cache_dir)
+        # The batch playbook is not next to the role, so point Ansible at it
+        env['ANSIBLE_ROLES_PATH'] = '/app'
+
+        ansible_command = [
+            'ansible-playbook',
+            '-i', inventory_path,
+            playbook_path,
+            '--user', 'ubuntu',
+            '--private-key', 'privatekey.pem',
+            '--ssh-common-args', '-o StrictHostKeyChecking=no',
+            '--forks', str(sum(len(hosts) for hosts in cache_dirs.values()))
+        ]
+        try:
+            output = run_logged_command(ansible_command, batch_id, env)
+        except subprocess.CalledProcessError:
+            # Rescued and ignored failures do not fail the run, so it stopped early; the recap shows whose plays ran
+            output = joblog.read_tail(batch_id, SUMMARY_TAIL_BYTES).decode(errors='replace')
+        results = batching.demultiplex(jobs, output)
+        factcache.collect_batch_cache(batch_cache_dir, cache_dirs)
+    finally:
+        with active_jobs_lock:
+            active_jobs -= 1
+        batching.remove_batch(batch_id)
+        for job in jobs:
+            succeeded = results.get(job['request_id'])
+            if succeeded is None:
+                joblog.unlink_log(job['request_id'])
+                start_ansible_playbook(job['ansible_command'], job['request_id'], on_complete=job['on_complete'], env=job['env'])
+                continue
+            if succeeded:
+                status = {'status': 'success', 'message': f'Cluster {job["kind"]} successful'}
+                ansible_playbook_response = output
+            else:
+                status = {'status': 'internal error', 'message': f'Cluster {job["kind"]} failed for {job["cluster_name"]}. Full log: /api/jobs/{job["request_id"]}/log'}
+            if job['kind'] == 'creation':
+                cluster_creation_status = status
+            else:
+                upgrade_status = status
+            job['on_complete'](succeeded)
+
+batch_queue = batching.BatchQueue(run_batch)
+
+def start_cluster_job(job):
+    """
+    Start a create/upgrade job, queueing small clusters to share an ansible-playbook run.
+    """
+    if not batching.is_batchable(job['master_ips'], job['worker_ips']):
+        start_ansible_playbook(job['ansible_command'], job['request_id'], on_complete=job['on_complete'], env=job['env'])
+        return
+    # Queued jobs hold no slot; the admission reservation is released when the request ends
+    # and run_batch takes one slot for the whole batch
+    batch_queue.submit(job)
+
+def parse_request(validator):
+    """
+    Validate the JSON payload of the current request against a compiled schema.
+
+    Returns:
+    - tuple: (data, None) on success, or (None, error response) listing every problem found.
+    """
+    data, errors = validator(request.get_json(silent=True))
+    if errors:
+        return None, (jsonify({'status': 'error', 'message': 'Invalid request payload: ' + '; '.join(errors), 'errors': errors}), 400)
+    return data, None
+
+def claim_request(operation, payload, build_response):
+    """
+    Deduplicate a mutation request before any work is started for it.
+
+    A retry carrying an Idempotency-Key that was already answered gets the
+    stored response back, and a request identical to a job that is still
+    running is coalesced onto that job's request_id.
+
+    Parameters:
+    - operation (str): Name of the operation (create, upgrade, ...).
+    - payload (dict): Validated request payload.
+    - build_response (callable): Builds the success response body from a request_id.
+
+    Returns:
+    - tuple: (request_id, fingerprint, early response). When the early
+      response is set the caller must return it without launching a job;
+      otherwise the job is started through hand_off_job.
+    """
+    idempotency_key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    fingerprint = idempotency.request_fingerprint(operation, payload)
+
+    stored_response, conflict = idempotency.lookup(get_collection('idempotency_keys'), idempotency_key, fingerprint)
+    if conflict:
+        error_message = f'{idempotency.IDEMPOTENCY_HEADER} "{idempotency_key}" was already used for a different request'
+        return None, fingerprint, (jsonify({'status': 'error', 'message': error_message}), 422)
+    if stored_response:
+        return stored_response['request_id'], fingerprint, jsonify(stored_response)
+
+    # Only jobs already handed off are registered, so this never joins a request that may still fail its checks
+    running_request_id = idempotency.inflight_request_id(fingerprint)
+    if running_request_id:
+        return running_request_id, fingerprint, coalesce_request(running_request_id, fingerprint, build_response)
+
+    return str(uuid.uuid4()), fingerprint, None
+
+def coalesce_request(request_id, fingerprint, build_response):
+    """
+    Answer a request with the request_id of the identical job that is already running.
+    """
+    response = build_response(request_id)
+    idempotency.remember(get_collection('idempotency_keys'), request.headers.get(idempotency.IDEMPOTENCY_HEADER), fingerprint, response)
+    return jsonify(response)
+
+def hand_off_job(fingerprint, build_response, job):
+    """
+    Register a checked request as in flight and start its job.
 
-def start_ansible_playbook(ansible_command):
-    Thread(target=run_ansible_playbook, args=(ansible_command,)).start()
+    The fingerprint is only registered here, once every check has passed, so
+    an identical request is never coalesced onto a request_id that does not run.
 
-def validate_ip_addresses(ips):
+    Returns:
+    - Response: None when the job was started, otherwise the coalesced
+      response for an identical job that was handed off first.
+    """
+    running_request_id, is_new = idempotency.claim_inflight(fingerprint, job['request_id'])
+    if not is_new:
+        return coalesce_request(running_request_id, fingerprint, build_response)
     try:
-        return [str(ipaddress.ip_address(ip)) for ip in ips]
-    except ValueError as e:
-        abort(400, jsonify({'status': 'error', 'message': f'Invalid IP address: {str(e)}'}))
+        start_cluster_job(dict(job, on_complete=lambda succeeded: idempotency.release_inflight(fingerprint)))
+    except Exception:
+        idempotency.release_inflight(fingerprint)
+        raise
+    return None
+
+def complete_request(fingerprint, response):
+    """
+    Record the response of a launched request against its Idempotency-Key.
+    """
+    idempotency_key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    idempotency.remember(get_collection('idempotency_keys'), idempotency_key, fingerprint, response)
+    return jsonify(response)
 
-def create_dynamic_inventory(master_ips, worker_ips):
+def create_dynamic_inventory(master_ips, worker_ips, group_vars=None, host_vars=None, host_names=None):
     try:
-        inventory_content = generate_inventory(master_ips, worker_ips)
-        with open('/tmp/dynamic_inventory.ini', 'w') as inventory_file:
-            inventory_file.write(inventory_content)
+        compiled_inventory = inventory.compile_inventory(master_ips, worker_ips, group_vars, host_vars, host_names)
+        return inventory.write_inventory(compiled_inventory)
     except Exception as e:
         abort(500, jsonify({'status': 'error', 'message': f'Error creating dynamic inventory: {str(e)}'}))
 
-def build_ansible_command(rke2_version, upgrade_required=False):
+def playbook_vars(rke2_version, upgrade_required=False, cluster_name=None):
+    """
+    Role variables for a create/upgrade run, passed as extra vars or, in a batch, as group vars.
+    """
+    variables = {}
+    if rke2_version:
+        variables['rke2_version'] = rke2_version
+    variables['rke2_drain_node_during_upgrade'] = str(upgrade_required)
+
+    # Fetch the kubeconfig so the health poller can reach the cluster's API server
+    if cluster_name:
+        variables.update({
+            'rke2_download_kubeconf': 'true',
+            'rke2_download_kubeconf_path': health.KUBECONFIG_DIR,
+            'rke2_download_kubeconf_file_name': f'{cluster_name}.yaml'
+        })
+    return variables
+
+def build_ansible_command(inventory_path, rke2_version, upgrade_required=False, cluster_name=None):
     try:
         playbook_path = '/app/rke2.yml'
         ansible_command = [
             'ansible-playbook',
-            '-i', '/tmp/dynamic_inventory.ini',
+            '-i', inventory_path,
             playbook_path,
             '--user', 'ubuntu',
             '--private-key', 'privatekey.pem',
             '--ssh-common-args', '-o StrictHostKeyChecking=no'
         ]
 
-        if rke2_version:
-            ansible_command.extend(['-e', f'rke2_version={rke2_version}'])
-        ansible_command.extend(['-e', f'rke2_drain_node_during_upgrade={upgrade_required}'])
+        for name, value in playbook_vars(rke2_version, upgrade_required, cluster_name).items():
+            ansible_command.extend(['-e', f'{name}={value}'])
 
         return ansible_command
     except Exception as e:
         abort(500, jsonify({'status': 'error', 'message': f'Error building Ansible command: {str(e)}'}))
 
+def run_preflight(payload, master_ips, worker_ips, server_ips=(), teardown=False):
+    """
+    Probe every node before any playbook is started for it.
+
+    Masters must all be reachable. Unreachable workers fail the request in
+    'reject' mode and are left out of the run in 'exclude' mode.
+
+    A teardown also leaves unreachable masters out in 'exclude' mode:
+    uninstalling the reachable nodes is still progress, and the skipped ones
+    are retried by the next delete. It only fails when no node is reachable.
+
+    Returns:
+    - tuple: (master_ips, worker_ips, report, error response).
+    """
+    if payload.get('preflight') == 'skip':
+        return master_ips, worker_ips, None, None
+
+    report = preflight.probe_nodes(master_ips + worker_ips, server_ips)
+    unreachable = [ip for ip in master_ips + worker_ips if not report[ip]['reachable']]
+    if not unreachable:
+        return master_ips, worker_ips, report, None
+
+    if teardown:
+        fatal = len(unreachable) == len(master_ips) + len(worker_ips)
+    else:
+        fatal = any(ip in master_ips for ip in unreachable)
+    if payload.get('preflight') == 'reject' or fatal:
+        error_message = f'Preflight check failed, unreachable node(s): {", ".join(unreachable)}'
+        return None, None, report, (jsonify({'status': 'error', 'message': error_message, 'preflight': report}), 400)
+    return [ip for ip in master_ips if ip not in unreachable], [ip for ip in worker_ips if ip not in unreachable], report, None
+
+def get_client_id():
+    api_key = request.headers.get('X-API-Key')
+    if api_key and ratelimit.is_known_api_key(api_key):
+        return f'key:{api_key}'
+    # ProxyFix has already resolved remote_addr from X-Forwarded-For when proxies are trusted
+    return request.remote_addr
+
+@app.before_request
+def enforce_rate_limits():
+    global active_jobs
+    route = request.url_rule.rule if request.url_rule else request.path
+
+    retry_after = ratelimit.take_token(get_client_id(), route)
+    if retry_after:
+        response = jsonify({'status': 'error', 'message': 'Rate limit exceeded, retry later'})
+        response.headers['Retry-After'] = ratelimit.retry_after_header(retry_after)
+        return response, 429
+
+    # The slot is reserved now, not when the job starts, so a burst of requests cannot all pass
+    with active_jobs_lock:
+        retry_after = ratelimit.admit(route, active_jobs)
+        if not retry_after and ratelimit.limits_for(route).get('admission'):
+            active_jobs += 1
+            g.reserved_job_slot = True
+    if retry_after:
+        response = jsonify({'status': 'error', 'message': f'Too many cluster operations in progress ({active_jobs}), retry later'})
+        response.headers['Retry-After'] = ratelimit.retry_after_header(retry_after)
+        return response, 429
+
+@app.teardown_request
+def release_job_slot(exception):
+    global active_jobs
+    # The request ended without starting a job (validation error, retry, preflight failure, ...)
+    if g.pop('reserved_job_slot', False):
+        with active_jobs_lock:
+            active_jobs -= 1
+
 # Modify the create_cluster function
 @app.route('/api/cluster/create', methods=['POST'])
 def create_cluster():
     global cluster_creation_status, latest_valid_request_id
 
-    rke2_version = request.json.get('rke2_k8s_version', None)
-    master_ips = request.json.get('master_ips', None)
-    worker_ips = request.json.get('worker_ips', [])
-    cluster_name = request.json.get('cluster_name', None)
+    payload, error_response = parse_request(validate_create_request)
+    if error_response:
+        return error_response
+
+    rke2_version = payload['rke2_k8s_version']
+    master_ips = payload['master_ips']
+    worker_ips = payload['worker_ips']
+    cluster_name = payload['cluster_name']
+
+    def build_response(request_id):
+        return {'status': 'success', 'message': 'Cluster creation request sent successfully', 'request_id': request_id, 'cluster_name': cluster_name}
 
-    if not rke2_version or not master_ips or not cluster_name:
-        missing_params = ', '.join(param for param, value in {'rke2_k8s_version': rke2_version, 'master_ips': master_ips, 'cluster_name': cluster_name}.items() if not value)
-        error_message = f'Both rke2_k8s_version, master_ips, and cluster_name are required attributes. Please pass the missing parameter(s) in the JSON payload: {missing_params}'
-        return jsonify({'status': 'error', 'message': error_message}), 400
+    # Retries are answered before the existence checks, which would otherwise reject them
+    request_id, fingerprint, early_response = claim_request('create', payload, build_response)
+    if early_response:
+        return early_response
 
     # Check if cluster with the same master IPs and worker IPs already exists in MongoDB
-    existing_cluster = clusters_collection.find_one({'master_ips': master_ips, 'worker_ips': worker_ips})
+    existing_cluster = get_collection('clusters').find_one({'master_ips': master_ips, 'worker_ips': worker_ips})
     if existing_cluster:
         return jsonify({'status': 'error', 'message': f'Cluster with the same master_ips and worker_ips already exists.'}), 400
 
     # Check if cluster with the same name already exists in MongoDB
-    existing_cluster = clusters_collection.find_one({'cluster_name': cluster_name})
+    existing_cluster = get_collection('clusters').find_one({'cluster_name': cluster_name})
     if existing_cluster:
         return jsonify({'status': 'error', 'message': f'Cluster with name "{cluster_name}" already exists.'}), 400
 
-    request_id = str(uuid.uuid4())
-    cluster_creation_status = {'status': 'pending', 'message': 'Cluster creation in progress', 'request_id': request_id, 'cluster_name': cluster_name}
-    latest_valid_request_id = request_id
+    master_ips, worker_ips, preflight_report, error_response = run_preflight(payload, master_ips, worker_ips)
+    if error_response:
+        return error_response
 
-    master_ips = validate_ip_addresses(master_ips)
-    worker_ips = validate_ip_addresses(worker_ips)
+    group_vars, host_vars = inventory.cluster_vars(None, payload)
+    inventory_path = create_dynamic_inventory(master_ips, worker_ips, group_vars, host_vars)
+    ansible_command = build_ansible_command(inventory_path, rke2_version, cluster_name=cluster_name)
+    early_response = hand_off_job(fingerprint, build_response, {
+        'kind': 'creation',
+        'request_id': request_id,
+        'cluster_name': cluster_name,
+        'master_ips': master_ips,
+        'worker_ips': worker_ips,
+        'group_vars': group_vars,
+        'host_vars': host_vars,
+        'host_names': {},
+        'extra_vars': playbook_vars(rke2_version, cluster_name=cluster_name),
+        'ansible_command': ansible_command,
+        'env': factcache.ansible_env(cluster_name, master_ips, worker_ips, rke2_version)
+    })
+    if early_response:
+        return early_response
 
-    create_dynamic_inventory(master_ips, worker_ips)
-    ansible_command = build_ansible_command(rke2_version)
-    start_ansible_playbook(ansible_command)
+    cluster_creation_status = {'status': 'pending', 'message': 'Cluster creation in progress', 'request_id': request_id, 'cluster_name': cluster_name}
+    latest_valid_request_id = request_id
 
     # Store cluster information in MongoDB
-    clusters_collection.insert_one({
+    get_collection('clusters').insert_one({
         'cluster_name': cluster_name,
         'request_id': request_id,
+        'rke2_k8s_version': rke2_version,
         'master_ips': master_ips,
-        'worker_ips': worker_ips
+        'worker_ips': worker_ips,
+        'group_vars': group_vars,
+        'host_vars': host_vars,
+        'host_names': {}
     })
 
-    return jsonify({'status': 'success', 'message': 'Cluster creation request sent successfully', 'request_id': request_id, 'cluster_name': cluster_name})
+    return complete_request(fingerprint, dict(build_response(request_id), preflight=preflight_report))
 
 
 @app.route('/api/cluster/upgrade', methods=['POST'])
 def upgrade_cluster():
     global upgrade_status, latest_valid_request_id
 
-    rke2_version = request.json.get('rke2_k8s_version', None)
-    master_ips = request.json.get('master_ips', None)
-    worker_ips = request.json.get('worker_ips', [])
-    upgrade_required = request.json.get('upgrade_required', False)
-    cluster_name = request.json.get('cluster_name', None)
-
-    if not rke2_version or not master_ips or not cluster_name:
-        missing_params = ', '.join(param for param, value in {'rke2_k8s_version': rke2_version, 'master_ips': master_ips, 'cluster_name': cluster_name}.items() if not value)
-        error_message = f'Both rke2_k8s_version, master_ips, and cluster_name are required attributes. Please pass the missing parameter(s) in the JSON payload: {missing_params}'
-        return jsonify({'status': 'error', 'message': error_message}), 400
+    payload, error_response = parse_request(validate_upgrade_request)
+    if error_response:
+        return error_response
+
+    rke2_version = payload['rke2_k8s_version']
+    master_ips = payload['master_ips']
+    worker_ips = payload['worker_ips']
+    upgrade_required = payload['upgrade_required']
+    cluster_name = payload['cluster_name']
+
+    def build_response(request_id):
+        return {'status': 'success', 'message': 'Cluster upgrade request sent successfully', 'request_id': request_id, 'cluster_name': cluster_name}
+
+    request_id, fingerprint, early_response = claim_request('upgrade', payload, build_response)
+    if early_response:
+        return early_response
+
+    # Masters of a running cluster also get their API server and supervisor ports checked
+    cluster_info = get_cluster_info(cluster_name)
+    server_ips = master_ips if cluster_info else []
+    run_master_ips, run_worker_ips, preflight_report, error_response = run_preflight(payload, master_ips, worker_ips, server_ips)
+    if error_response:
+        return error_response
+
+    # Vars stored with the cluster apply to every run; the request can override them
+    group_vars, host_vars = inventory.cluster_vars(cluster_info, payload)
+    host_names = cluster_host_names(cluster_info)
+    inventory_path = create_dynamic_inventory(run_master_ips, run_worker_ips, group_vars, host_vars, host_names)
+    ansible_command = build_ansible_command(inventory_path, rke2_version, upgrade_required, cluster_name)
+    early_response = hand_off_job(fingerprint, build_response, {
+        'kind': 'upgrade',
+        'request_id': request_id,
+        'cluster_name': cluster_name,
+        'master_ips': run_master_ips,
+        'worker_ips': run_worker_ips,
+        'group_vars': group_vars,
+        'host_vars': host_vars,
+        'host_names': host_names,
+        'extra_vars': playbook_vars(rke2_version, upgrade_required, cluster_name),
+        'ansible_command': ansible_command,
+        'env': factcache.ansible_env(cluster_name, run_master_ips, run_worker_ips, rke2_version, host_names)
+    })
+    if early_response:
+        return early_response
 
-    request_id = str(uuid.uuid4())
     upgrade_status = {'status': 'pending', 'message': 'Cluster upgrade in progress', 'request_id': request_id}
     latest_valid_request_id = request_id
 
-    master_ips = validate_ip_addresses(master_ips)
-    worker_ips = validate_ip_addresses(worker_ips)
-
-    create_dynamic_inventory(master_ips, worker_ips)
-    ansible_command = build_ansible_command(rke2_version, upgrade_required)
-    start_ansible_playbook(ansible_command)
+    if cluster_info:
+        get_collection('clusters').update_one({'cluster_name': cluster_name}, {'$set': {
+            'rke2_k8s_version': rke2_version,
+            'master_ips': master_ips,
+            'worker_ips': worker_ips,
+            'group_vars': group_vars,
+            'host_vars': host_vars
+        }})
 
-    return jsonify({'status': 'success', 'message': 'Cluster upgrade request sent successfully', 'request_id': request_id, 'cluster_name': cluster_name})
+    return complete_request(fingerprint, dict(build_response(request_id), preflight=preflight_report))
 
 @app.route('/api/cluster/status', methods=['GET'])
 def get_cluster_status():
     global cluster_creation_status, latest_valid_request_id, ansible_playbook_response
 
-    cluster_name = request.json.get('cluster_name', None)
+    payload, error_response = parse_request(validate_cluster_name_request)
+    if error_response:
+        return error_response
 
-    if not cluster_name:
-        return jsonify({'status': 'error', 'message': 'Cluster name not provided in the JSON payload'}), 400
+    cluster_name = payload['cluster_name']
 
-    # Retrieve cluster information from MongoDB
-    cluster_info = clusters_collection.find_one({'cluster_name': cluster_name})
+    # Clusters the health poller knows about exist; only fall back to MongoDB for the rest
+    cluster_health = health.get_snapshot(cluster_name)
+    cluster_info = cluster_health or get_collection('clusters').find_one({'cluster_name': cluster_name})
 
     if cluster_info:
         status_without_request_id = {
             'message': cluster_creation_status['message'],
             'status': cluster_creation_status['status'],
-            'ansible_playbook_response': None
+            'ansible_playbook_response': None,
+            'cluster_health': cluster_health
         }
 
         if cluster_creation_status['status'] == 'success':
@@ -281,47 +725,278 @@ def get_upgrade_status():
 
 @app.route('/api/cluster/delete', methods=['DELETE'])
 def delete_cluster():
-    global clusters_info, delete_status
+    global delete_status
 
-    cluster_name = request.json.get('cluster_name', None)
-    rke2_version = request.json.get('rke2_k8s_version', None)
-    master_ips = request.json.get('master_ips', [])
-    worker_ips = request.json.get('worker_ips', [])
+    payload, error_response = parse_request(validate_delete_request)
+    if error_response:
+        return error_response
 
-    if not cluster_name or not rke2_version or not master_ips or not worker_ips:
-        missing_params = ', '.join(param for param, value in {'cluster_name': cluster_name, 'rke2_k8s_version': rke2_version, 'master_ips': master_ips, 'worker_ips': worker_ips}.items() if not value)
-        error_message = f'cluster_name, rke2_k8s_version, master_ips, and worker_ips are required attributes. Please pass the missing parameter(s) in the JSON payload: {missing_params}'
-        return jsonify({'status': 'error', 'message': error_message}), 400
+    cluster_name = payload['cluster_name']
+
+    # Reserved before the record is read and the nodes probed, so a concurrent delete
+    # cannot launch an overlapping teardown or act on a record the running one will update
+    with teardown_lock:
+        if cluster_name in teardown_progress:
+            return jsonify({'status': 'error', 'message': f'Cluster "{cluster_name}" is already being deleted', 'nodes': teardown_progress[cluster_name]}), 409
+        teardown_progress[cluster_name] = {}
+
+    launched = False
+    try:
+        cluster_info = get_cluster_info(cluster_name)
+        if not cluster_info:
+            return jsonify({'status': 'error', 'message': f'Cluster with name "{cluster_name}" not found'}), 404
+
+        master_ips = cluster_info.get('master_ips') or []
+        worker_ips = cluster_info.get('worker_ips') or []
+
+        # A rerun only retries the nodes a previous teardown did not confirm as clean
+        host_names = cluster_host_names(cluster_info)
+        node_status = cluster_info.get('teardown_nodes') or {}
+        pending_hosts = [inventory.host_name(ip, host_names) for ip in master_ips + worker_ips if node_status.get(inventory.host_name(ip, host_names)) != 'clean']
+        if not pending_hosts:
+            get_collection('clusters').delete_one({'cluster_name': cluster_name})
+            health.forget(cluster_name)
+            factcache.forget(cluster_name)
+            return jsonify({'status': 'success', 'message': f'All nodes of cluster "{cluster_name}" were already uninstalled', 'cluster_name': cluster_name})
+
+        pending_master_ips = [ip for ip in master_ips if inventory.host_name(ip, host_names) in pending_hosts]
+        pending_worker_ips = [ip for ip in worker_ips if inventory.host_name(ip, host_names) in pending_hosts]
+        run_master_ips, run_worker_ips, preflight_report, error_response = run_preflight(payload, pending_master_ips, pending_worker_ips, teardown=True)
+        if error_response:
+            return error_response
+        # Unreachable nodes are recorded as failed so a later delete retries them
+        run_ips = run_master_ips + run_worker_ips
+        for ip in pending_master_ips + pending_worker_ips:
+            if ip not in run_ips:
+                node_status[inventory.host_name(ip, host_names)] = 'failed'
+        pending_hosts = [inventory.host_name(ip, host_names) for ip in run_ips]
+
+        inventory_path = create_dynamic_inventory(master_ips, worker_ips, cluster_info.get('group_vars'), cluster_info.get('host_vars'), host_names)
+        ansible_command = [
+            'ansible-playbook',
+            '-i', inventory_path,
+            '/app/uninstall.yml',
+            '--user', 'ubuntu',
+            '--private-key', 'privatekey.pem',
+            '--ssh-common-args', '-o StrictHostKeyChecking=no',
+            '--limit', ','.join(pending_hosts),
+            '--forks', str(max(1, min(len(pending_hosts), TEARDOWN_MAX_FORKS)))
+        ]
 
-    if cluster_name not in clusters_info:
+        request_id = str(uuid.uuid4())
+
+        def on_output_line(line):
+            task_result = recap.parse_task_result(line)
+            if task_result:
+                host, result = task_result
+                teardown_progress[cluster_name][host] = 'failed' if result in ('fatal', 'failed', 'unreachable') else 'clean'
+
+        def on_complete(succeeded):
+            global delete_status
+            try:
+                host_recap = recap.parse_play_recap(joblog.read_tail(request_id, SUMMARY_TAIL_BYTES).decode(errors='replace'))
+                for host in pending_hosts:
+                    host_succeeded = host in host_recap and recap.host_succeeded(host_recap[host])
+                    node_status[host] = 'clean' if host_succeeded else 'failed'
+
+                failed_hosts = [host for host, status in node_status.items() if status != 'clean']
+                if failed_hosts:
+                    get_collection('clusters').update_one({'cluster_name': cluster_name}, {'$set': {'teardown_nodes': node_status}})
+                    delete_status = {'status': 'internal error', 'message': f'Cluster deletion incomplete, failed node(s): {", ".join(failed_hosts)}', 'request_id': request_id, 'cluster_name': cluster_name}
+                else:
+                    # Only forget the cluster once every node is confirmed uninstalled
+                    get_collection('clusters').delete_one({'cluster_name': cluster_name})
+                    health.forget(cluster_name)
+                    factcache.forget(cluster_name)
+                    delete_status = {'status': 'success', 'message': 'Cluster deletion successful', 'request_id': request_id, 'cluster_name': cluster_name}
+            except Exception as e:
+                delete_status = {'status': 'internal error', 'message': f'Cluster deletion outcome could not be recorded: {str(e)}', 'request_id': request_id, 'cluster_name': cluster_name}
+                raise
+            finally:
+                # Always release the cluster, or every later delete would get 409 until a restart
+                teardown_progress.pop(cluster_name, None)
+
+        delete_status = {'status': 'pending', 'message': 'Cluster deletion in progress', 'request_id': request_id, 'cluster_name': cluster_name}
+        start_ansible_playbook(ansible_command, request_id, on_complete=on_complete, on_output_line=on_output_line)
+        launched = True
+    finally:
+        if not launched:
+            teardown_progress.pop(cluster_name, None)
+
+    return jsonify({'status': 'success', 'message': f'Delete cluster request sent successfully for cluster "{cluster_name}"', 'request_id': request_id, 'cluster_name': cluster_name, 'nodes': pending_hosts, 'preflight': preflight_report})
+
+@app.route('/api/cluster/<cluster_name>/teardown', methods=['GET'])
+def get_teardown_status(cluster_name):
+    if cluster_name in teardown_progress:
+        return jsonify({'status': 'pending', 'cluster_name': cluster_name, 'nodes': teardown_progress[cluster_name]}), 202
+
+    cluster_info = get_cluster_info(cluster_name)
+    if not cluster_info:
+        return jsonify({'status': 'success', 'message': f'Cluster "{cluster_name}" is not registered', 'cluster_name': cluster_name})
+    if not cluster_info.get('teardown_nodes'):
+        return jsonify({'status': 'error', 'message': f'No teardown has been run for cluster "{cluster_name}"'}), 404
+    return jsonify({'status': 'incomplete', 'cluster_name': cluster_name, 'nodes': cluster_info['teardown_nodes']})
+
+def build_scale_command(inventory_path, playbook_path, cluster_info, limit_ips):
+    """
+    Build an ansible-playbook command that only runs against the given nodes.
+
+    The rest of the cluster stays in the inventory so the role can resolve
+    groups, but --limit keeps it out of the play. The first master is passed
+    as the active server so new nodes join it instead of bootstrapping.
+    """
+    first_master_ip = cluster_info['master_ips'][0]
+    host_names = cluster_host_names(cluster_info)
+    ansible_command = build_ansible_command(inventory_path, cluster_info.get('rke2_k8s_version'))
+    ansible_command[ansible_command.index('/app/rke2.yml')] = playbook_path
+    ansible_command.extend(['--limit', ','.join(inventory.host_name(ip, host_names) for ip in limit_ips)])
+    ansible_command.extend(['-e', f'active_server={inventory.host_name(first_master_ip, host_names)}'])
+
+    # rke2_api_ip defaults to a fact of the first master, which is not gathered under --limit
+    cluster_group_vars = (cluster_info.get('group_vars') or {}).get(inventory.CLUSTER_GROUP) or {}
+    if 'rke2_api_ip' not in cluster_group_vars:
+        ansible_command.extend(['-e', f'rke2_api_ip={first_master_ip}'])
+    return ansible_command
+
+@app.route('/api/cluster/<cluster_name>/nodes', methods=['POST'])
+def add_cluster_nodes(cluster_name):
+    payload, error_response = parse_request(validate_scale_request)
+    if error_response:
+        return error_response
+    if not payload['master_ips'] and not payload['worker_ips']:
+        return jsonify({'status': 'error', 'message': 'At least one of master_ips or worker_ips must list a node'}), 400
+
+    cluster_info = get_cluster_info(cluster_name)
+    if not cluster_info:
         return jsonify({'status': 'error', 'message': f'Cluster with name "{cluster_name}" not found'}), 404
+    # Without it the role would install its default version on the new nodes, whatever the cluster runs
+    if not cluster_info.get('rke2_k8s_version'):
+        return jsonify({'status': 'error', 'message': f'Cluster "{cluster_name}" has no recorded RKE2 version; run an upgrade with rke2_k8s_version first'}), 400
+
+    master_ips = cluster_info.get('master_ips') or []
+    worker_ips = cluster_info.get('worker_ips') or []
+    new_master_ips = [ip for ip in payload['master_ips'] if ip not in master_ips]
+    new_worker_ips = [ip for ip in payload['worker_ips'] if ip not in worker_ips]
+
+    conflicts = [ip for ip in new_master_ips if ip in worker_ips] + [ip for ip in new_worker_ips if ip in master_ips]
+    if conflicts:
+        return jsonify({'status': 'error', 'message': f'Node(s) already part of the cluster with another role: {", ".join(conflicts)}'}), 400
+
+    new_ips = new_master_ips + new_worker_ips
+    if not new_ips:
+        return jsonify({'status': 'success', 'message': 'All nodes are already part of the cluster', 'cluster_name': cluster_name})
+
+    master_ips = master_ips + new_master_ips
+    worker_ips = worker_ips + new_worker_ips
+    host_names = cluster_host_names(cluster_info)
+    inventory_path = create_dynamic_inventory(master_ips, worker_ips, cluster_info.get('group_vars'), cluster_info.get('host_vars'), host_names)
+    ansible_command = build_scale_command(inventory_path, '/app/rke2.yml', cluster_info, new_ips)
+    env = factcache.ansible_env(cluster_name, master_ips, worker_ips, cluster_info.get('rke2_k8s_version'), host_names)
+
+    def on_complete(succeeded):
+        if succeeded:
+            get_collection('clusters').update_one({'cluster_name': cluster_name}, {'$addToSet': {
+                'master_ips': {'$each': new_master_ips},
+                'worker_ips': {'$each': new_worker_ips}
+            }})
 
-    master_ips = validate_ip_addresses(master_ips)
-    worker_ips = validate_ip_addresses(worker_ips)
+    request_id = str(uuid.uuid4())
+    start_ansible_playbook(ansible_command, request_id, on_complete=on_complete, env=env)
 
-    create_dynamic_inventory(master_ips, worker_ips)
+    return jsonify({'status': 'success', 'message': f'Adding {len(new_ips)} node(s) to cluster "{cluster_name}"', 'request_id': request_id, 'cluster_name': cluster_name, 'nodes': new_ips})
 
-    playbook_path = '/home/ubuntu/uninstall.yml'  # Update with the correct path to uninstall.yml
-    ansible_command = [
-        'ansible-playbook',
-        '-i', '/tmp/dynamic_inventory.ini',
-        playbook_path,
-        '--user', 'ubuntu',
-        '--private-key', 'privatekey.pem',
-        '--ssh-common-args', '-o StrictHostKeyChecking=no'
-    ]
+@app.route('/api/cluster/<cluster_name>/nodes', methods=['DELETE'])
+def remove_cluster_nodes(cluster_name):
+    payload, error_response = parse_request(validate_scale_request)
+    if error_response:
+        return error_response
+    if not payload['master_ips'] and not payload['worker_ips']:
+        return jsonify({'status': 'error', 'message': 'At least one of master_ips or worker_ips must list a node'}), 400
 
-    if rke2_version:
-        ansible_command.extend(['-e', f'rke2_version={rke2_version}'])
+    cluster_info = get_cluster_info(cluster_name)
+    if not cluster_info:
+        return jsonify({'status': 'error', 'message': f'Cluster with name "{cluster_name}" not found'}), 404
 
-    start_ansible_playbook(ansible_command)
+    master_ips = cluster_info.get('master_ips') or []
+    worker_ips = cluster_info.get('worker_ips') or []
+    removed_master_ips = [ip for ip in payload['master_ips'] if ip in master_ips]
+    removed_worker_ips = [ip for ip in payload['worker_ips'] if ip in worker_ips]
+
+    unknown = [ip for ip in payload['master_ips'] + payload['worker_ips'] if ip not in removed_master_ips + removed_worker_ips]
+    if unknown:
+        return jsonify({'status': 'error', 'message': f'Node(s) not part of the cluster with that role: {", ".join(unknown)}'}), 400
+    if master_ips[0] in removed_master_ips or len(removed_master_ips) == len(master_ips):
+        return jsonify({'status': 'error', 'message': 'The first master node cannot be removed, delete the cluster instead'}), 400
+
+    removed_ips = removed_master_ips + removed_worker_ips
+    # An empty --limit would not limit the run at all, so scale_in.yml would uninstall every node
+    if not removed_ips:
+        return jsonify({'status': 'error', 'message': 'No nodes to remove'}), 400
+    host_names = cluster_host_names(cluster_info)
+    inventory_path = create_dynamic_inventory(master_ips, worker_ips, cluster_info.get('group_vars'), cluster_info.get('host_vars'), host_names)
+    ansible_command = build_scale_command(inventory_path, '/app/scale_in.yml', cluster_info, removed_ips)
+    env = factcache.ansible_env(cluster_name, master_ips, worker_ips, cluster_info.get('rke2_k8s_version'), host_names)
+
+    def on_complete(succeeded):
+        if succeeded:
+            get_collection('clusters').update_one({'cluster_name': cluster_name}, {'$pullAll': {
+                'master_ips': removed_master_ips,
+                'worker_ips': removed_worker_ips
+            }})
 
     request_id = str(uuid.uuid4())
-    delete_status = {'status': 'pending', 'message': 'Cluster deletion in progress', 'request_id': request_id, 'cluster_name': cluster_name}
+    start_ansible_playbook(ansible_command, request_id, on_complete=on_complete, env=env)
+
+    return jsonify({'status': 'success', 'message': f'Removing {len(removed_ips)} node(s) from cluster "{cluster_name}"', 'request_id': request_id, 'cluster_name': cluster_name, 'nodes': removed_ips})
+
+@app.route('/api/jobs/<request_id>/log', methods=['GET'])
+def get_job_log(request_id):
+    try:
+        request_id = str(uuid.UUID(request_id))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'request_id must be a UUID'}), 400
+
+    size = joblog.log_size(request_id)
+    if size is None:
+        return jsonify({'status': 'error', 'message': f'No log found for request "{request_id}"'}), 404
+
+    # request.args.get(type=int) would silently fall back to the default on bad input
+    try:
+        tail = int(request.args['tail']) if 'tail' in request.args else None
+        offset = int(request.args.get('offset', 0))
+        length = int(request.args.get('length', joblog.CHUNK_SIZE * 16))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'offset, tail and length must be integers'}), 400
+
+    # Ranges are served per request, so a single response never holds more than this
+    length = min(length, joblog.CHUNK_SIZE * 16)
+    if tail is not None:
+        tail = min(tail, length)
+        offset = max(0, size - tail)
+        data = joblog.read_range(request_id, offset, tail)
+    else:
+        data = joblog.read_range(request_id, max(0, offset), length)
+
+    response = Response(data, mimetype='text/plain')
+    response.headers['X-Log-Offset'] = str(max(0, offset))
+    response.headers['X-Log-Size'] = str(size)
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    return jsonify({'status': 'alive'})
 
-    del clusters_info[cluster_name]
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    # Readiness only needs the app itself; database state is reported, not waited on
+    database = {key: value for key, value in db_health.items() if key != 'checked_at'}
+    return jsonify({'status': 'ready', 'database': database})
 
-    return jsonify({'status': 'success', 'message': f'Delete cluster request sent successfully for cluster "{cluster_name}"', 'request_id': request_id, 'cluster_name': cluster_name})
+@app.route('/healthz/db', methods=['GET'])
+def database_health():
+    db_status = check_db_health()
+    body = {key: value for key, value in db_status.items() if key != 'checked_at'}
+    return jsonify(body), 200 if db_status['status'] == 'ok' else 503
 
 @app.route('/api/cluster/list', methods=['GET'])
 def get_cluster_list():
@@ -345,4 +1020,7 @@ def internal_server_error(error):
     return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    start_db_health_watcher()
+    if os.environ.get('KMS_HEALTH_POLLER', 'true').lower() == 'true':
+        health.start_poller()
     app.run(debug=True, host='0.0.0.0', use_reloader=False)
@@ -0,0 +1,189 @@
+# batching.py
+import json
+import os
+import re
+from threading import Lock, Thread, Timer
+
+import inventory
+import recap
+
+BATCH_DIR = os.path.join(os.environ.get('KMS_DATA_DIR', '/kms-volumemount'), 'batches')
+# How long the first queued job waits for others to share its ansible-playbook run; 0 (the
+# default) disables batching. Clusters in a batch are deployed one after another, each play
+# waiting for the previous one, so the last cluster of a batch waits for every earlier
+# cluster's full deploy, and a slow or hung cluster delays all the clusters behind it.
+# Only enable it where per-run Ansible startup costs more than that.
+BATCH_WINDOW_SECONDS = float(os.environ.get('KMS_BATCH_WINDOW_SECONDS', 0))
+BATCH_MAX_CLUSTERS = int(os.environ.get('KMS_BATCH_MAX_CLUSTERS', 8))
+# Only clusters up to this many nodes are batched; larger ones amortize startup on their own
+BATCH_MAX_NODES = int(os.environ.get('KMS_BATCH_MAX_NODES', 3))
+
+
+def is_batchable(master_ips, worker_ips):
+    return BATCH_WINDOW_SECONDS > 0 and len(master_ips) + len(worker_ips) <= BATCH_MAX_NODES
+
+
+def group_names(index, cluster_name):
+    """
+    Inventory group names for one cluster of a batch, safe as Ansible group names.
+    """
+    prefix = f'kms{index}_' + re.sub(r'[^A-Za-z0-9_]', '_', cluster_name)
+    return prefix, f'{prefix}_masters', f'{prefix}_workers'
+
+
+def compile_batch(jobs):
+    """
+    Build the combined inventory and playbook for a batch of cluster jobs.
+
+    Each cluster gets its own group, with the role's group-name variables and
+    the per-run rke2_* settings as group vars, and its own play. Plays run
+    serially, so a cluster only starts once every earlier one has finished.
+
+    ansible-playbook stops at a play in which every host failed or became
+    unreachable, so nothing in a play may fail outside the rescue: facts are
+    gathered inside the block, handlers are flushed inside it, and
+    unreachable hosts stay in the play (ignore_unreachable) and are failed
+    explicitly by a task that runs on the controller.
+
+    Parameters:
+    - jobs (list): Job dicts with cluster_name, master_ips, worker_ips,
+      group_vars, host_vars, host_names and extra_vars.
+
+    Returns:
+    - tuple: (inventory dict, playbook list).
+    """
+    combined_groups = {}
+    playbook = []
+    for index, job in enumerate(jobs):
+        names = group_names(index, job['cluster_name'])
+        cluster_inventory = inventory.compile_inventory(
+            job['master_ips'], job['worker_ips'], job['group_vars'], job['host_vars'], job['host_names'], names)
+        cluster_group = cluster_inventory['all']['children'][names[0]]
+        cluster_group['vars'] = dict(
+            cluster_group.get('vars') or {},
+            rke2_cluster_group_name=names[0],
+            rke2_servers_group_name=names[1],
+            rke2_agents_group_name=names[2],
+            **job['extra_vars'])
+        combined_groups[names[0]] = cluster_group
+
+        playbook.append({
+            'name': f'Deploy RKE2 cluster {job["cluster_name"]}',
+            'hosts': names[0],
+            'become': True,
+            'gather_facts': False,
+            'ignore_unreachable': True,
+            'tasks': [{
+                'name': f'Deploy cluster {job["cluster_name"]}',
+                'block': [
+                    {'name': 'Check connection', 'ansible.builtin.ping': {}, 'register': 'kms_ping'},
+                    {
+                        'name': 'Fail unreachable host',
+                        'ansible.builtin.fail': {'msg': 'Host is unreachable'},
+                        'when': 'kms_ping.unreachable | default(false)',
+                    },
+                    # Same effect as smart gathering: hosts with cached facts are not gathered again
+                    {'name': 'Gather facts', 'ansible.builtin.setup': {}, 'when': 'ansible_facts.distribution is not defined'},
+                    {'name': 'Run lablabs.rke2', 'ansible.builtin.include_role': {'name': 'lablabs.rke2'}},
+                    {'name': 'Run notified handlers', 'ansible.builtin.meta': 'flush_handlers'},
+                ],
+                'rescue': [{
+                    'name': 'Record cluster failure',
+                    'ansible.builtin.debug': {'msg': f'RKE2 deployment failed for cluster {job["cluster_name"]}'},
+                }],
+            }],
+        })
+
+    return {'all': {'children': combined_groups}}, playbook
+
+
+def write_batch(batch_id, jobs):
+    """
+    Write a batch's inventory and playbook.
+
+    Returns:
+    - tuple: (inventory path, playbook path).
+    """
+    combined_inventory, playbook = compile_batch(jobs)
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    inventory_path = os.path.join(BATCH_DIR, f'{batch_id}.inventory.json')
+    playbook_path = os.path.join(BATCH_DIR, f'{batch_id}.yml')
+    with open(inventory_path, 'w') as inventory_file:
+        json.dump(combined_inventory, inventory_file, indent=2)
+    # JSON is valid YAML, so the playbook needs no YAML dependency
+    with open(playbook_path, 'w') as playbook_file:
+        json.dump(playbook, playbook_file, indent=2)
+    return inventory_path, playbook_path
+
+
+def remove_batch(batch_id):
+    for suffix in ('.inventory.json', '.yml'):
+        try:
+            os.remove(os.path.join(BATCH_DIR, f'{batch_id}{suffix}'))
+        except FileNotFoundError:
+            pass
+
+
+def demultiplex(jobs, output):
+    """
+    Work out which jobs of a batch succeeded from the run's PLAY RECAP.
+
+    A job succeeded when every one of its hosts is in the recap and none
+    failed, was unreachable, was rescued or had a result ignored. The role
+    ignores no errors itself, so an ignored result is an unreachable host.
+
+    Returns:
+    - dict: request_id -> bool, or None for jobs with no host in the recap,
+      whose play never ran (e.g. the run was aborted before it).
+    """
+    host_recap = recap.parse_play_recap(output)
+    results = {}
+    for job in jobs:
+        hosts = [inventory.host_name(ip, job['host_names']) for ip in job['master_ips'] + job['worker_ips']]
+        if not any(host in host_recap for host in hosts):
+            results[job['request_id']] = None
+            continue
+        results[job['request_id']] = all(
+            host in host_recap and recap.host_succeeded(host_recap[host]) and not host_recap[host].get('ignored')
+            for host in hosts)
+    return results
+
+
+class BatchQueue:
+    """
+    Collect small-cluster jobs for a short window and hand them to run_batch together.
+    """
+
+    def __init__(self, run_batch):
+        self.run_batch = run_batch
+        self.jobs = []
+        self.hosts = set()
+        self.timer = None
+        self.lock = Lock()
+
+    def submit(self, job):
+        job_hosts = {inventory.host_name(ip, job['host_names']) for ip in job['master_ips'] + job['worker_ips']}
+        with self.lock:
+            # A node can only belong to one cluster of a batch; start a new batch instead
+            if job_hosts & self.hosts:
+                self._flush_locked()
+            self.jobs.append(job)
+            self.hosts |= job_hosts
+            if len(self.jobs) >= BATCH_MAX_CLUSTERS:
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = Timer(BATCH_WINDOW_SECONDS, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        jobs, self.jobs, self.hosts = self.jobs, [], set()
+        if jobs:
+            Thread(target=self.run_batch, args=(jobs,)).start()
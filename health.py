@@ -0,0 +1,173 @@
+# health.py
+import asyncio
+import base64
+import json
+import os
+import ssl
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from threading import Thread
+
+KUBECONFIG_DIR = os.path.join(os.environ.get('KMS_DATA_DIR', '/kms-volumemount'), 'kubeconfigs')
+POLL_INTERVAL_SECONDS = int(os.environ.get('KMS_HEALTH_POLL_INTERVAL_SECONDS', 30))
+POLL_TIMEOUT_SECONDS = int(os.environ.get('KMS_HEALTH_POLL_TIMEOUT_SECONDS', 5))
+MAX_CONCURRENT_POLLS = int(os.environ.get('KMS_HEALTH_MAX_CONCURRENT_POLLS', 16))
+MAX_BACKOFF_SECONDS = int(os.environ.get('KMS_HEALTH_MAX_BACKOFF_SECONDS', 600))
+
+# cluster_name -> latest health snapshot; entries are replaced, never mutated
+cluster_health = {}
+# cluster_name -> (consecutive failures, monotonic time of the next poll)
+_backoff = {}
+# kubeconfig path -> (mtime, (server URL, SSLContext))
+_clients = {}
+_poller_thread = None
+
+
+def kubeconfig_path(cluster_name):
+    return os.path.join(KUBECONFIG_DIR, f'{cluster_name}.yaml')
+
+
+def get_snapshot(cluster_name):
+    """
+    Return the last polled health of a cluster, or None if it was never polled.
+    """
+    return cluster_health.get(cluster_name)
+
+
+def forget(cluster_name):
+    """
+    Stop polling a cluster and drop its kubeconfig and snapshot.
+    """
+    try:
+        os.remove(kubeconfig_path(cluster_name))
+    except FileNotFoundError:
+        pass
+    cluster_health.pop(cluster_name, None)
+    _backoff.pop(cluster_name, None)
+
+
+def _write_secret(data):
+    secret_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pem')
+    with secret_file:
+        secret_file.write(base64.b64decode(data))
+    return secret_file.name
+
+
+def _load_client(path):
+    """
+    Build the API server URL and TLS context from an RKE2 kubeconfig, cached per file version.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _clients.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    import yaml
+
+    with open(path) as kubeconfig_file:
+        kubeconfig = yaml.safe_load(kubeconfig_file)
+    cluster = kubeconfig['clusters'][0]['cluster']
+    user = kubeconfig['users'][0]['user']
+
+    context = ssl.create_default_context(cadata=base64.b64decode(cluster['certificate-authority-data']).decode())
+    # The server certificate is issued for the node, not for the address we reach it on
+    context.check_hostname = False
+    cert_path = _write_secret(user['client-certificate-data'])
+    key_path = _write_secret(user['client-key-data'])
+    try:
+        context.load_cert_chain(cert_path, key_path)
+    finally:
+        os.remove(cert_path)
+        os.remove(key_path)
+
+    client = (cluster['server'].rstrip('/'), context)
+    _clients[path] = (mtime, client)
+    return client
+
+
+def _fetch_nodes(path):
+    server, context = _load_client(path)
+    with urllib.request.urlopen(f'{server}/api/v1/nodes', context=context, timeout=POLL_TIMEOUT_SECONDS) as response:
+        return json.load(response)
+
+
+def summarize_nodes(node_list):
+    """
+    Reduce a Kubernetes NodeList to ready/not-ready counts and versions.
+    """
+    nodes = []
+    for node in node_list.get('items', []):
+        conditions = {condition['type']: condition['status'] for condition in node.get('status', {}).get('conditions', [])}
+        nodes.append({
+            'name': node['metadata']['name'],
+            'ready': conditions.get('Ready') == 'True',
+            'version': node.get('status', {}).get('nodeInfo', {}).get('kubeletVersion'),
+        })
+
+    nodes_ready = sum(1 for node in nodes if node['ready'])
+    return {
+        'status': 'healthy' if nodes and nodes_ready == len(nodes) else 'degraded',
+        'nodes_ready': nodes_ready,
+        'nodes_not_ready': len(nodes) - nodes_ready,
+        'versions': sorted({node['version'] for node in nodes if node['version']}),
+        'nodes': nodes,
+    }
+
+
+async def _poll_cluster(cluster_name, path, semaphore):
+    loop = asyncio.get_event_loop()
+    async with semaphore:
+        try:
+            node_list = await loop.run_in_executor(None, _fetch_nodes, path)
+            snapshot = summarize_nodes(node_list)
+            _backoff.pop(cluster_name, None)
+        except Exception as e:
+            failures = _backoff.get(cluster_name, (0, 0))[0] + 1
+            delay = min(POLL_INTERVAL_SECONDS * 2 ** failures, MAX_BACKOFF_SECONDS)
+            _backoff[cluster_name] = (failures, time.monotonic() + delay)
+            previous = cluster_health.get(cluster_name) or {}
+            snapshot = dict(previous, status='unreachable', error=str(e), consecutive_failures=failures)
+
+    snapshot['checked_at'] = datetime.utcnow().isoformat() + 'Z'
+    cluster_health[cluster_name] = snapshot
+
+
+async def poll_once():
+    """
+    Poll every cluster with a downloaded kubeconfig that is not backing off.
+    """
+    if not os.path.isdir(KUBECONFIG_DIR):
+        return
+
+    now = time.monotonic()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+    polls = []
+    for file_name in os.listdir(KUBECONFIG_DIR):
+        if not file_name.endswith('.yaml'):
+            continue
+        cluster_name = file_name[:-len('.yaml')]
+        if _backoff.get(cluster_name, (0, 0))[1] > now:
+            continue
+        polls.append(_poll_cluster(cluster_name, os.path.join(KUBECONFIG_DIR, file_name), semaphore))
+
+    if polls:
+        await asyncio.gather(*polls)
+
+
+async def _poll_forever():
+    while True:
+        started_at = time.monotonic()
+        await poll_once()
+        await asyncio.sleep(max(0, POLL_INTERVAL_SECONDS - (time.monotonic() - started_at)))
+
+
+def start_poller():
+    """
+    Start the background health poller once per process.
+    """
+    global _poller_thread
+    if _poller_thread is None:
+        _poller_thread = Thread(target=asyncio.run, args=(_poll_forever(),), daemon=True)
+        _poller_thread.start()
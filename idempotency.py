@@ -0,0 +1,107 @@
+# idempotency.py
+import hashlib
+import json
+import os
+from datetime import datetime
+from threading import Lock
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('KMS_IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+
+# fingerprint -> request_id of the job currently running for that request
+_inflight_jobs = {}
+_inflight_lock = Lock()
+_indexes_ready = False
+
+
+def request_fingerprint(operation, payload):
+    """
+    Hash an operation and its validated payload into a stable fingerprint.
+
+    Parameters:
+    - operation (str): Name of the operation (create, upgrade, ...).
+    - payload (dict): Normalized request payload.
+
+    Returns:
+    - str: Hex digest identifying identical requests.
+    """
+    body = json.dumps({'operation': operation, 'payload': payload}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def ensure_indexes(collection):
+    global _indexes_ready
+    if not _indexes_ready:
+        # MongoDB drops stored keys on its own once they are older than the TTL
+        collection.create_index('created_at', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+        _indexes_ready = True
+
+
+def lookup(collection, key, fingerprint):
+    """
+    Look up a previously stored response for an Idempotency-Key.
+
+    Returns:
+    - tuple: (response, conflict). response is the stored response body or
+      None; conflict is True when the key was already used for a different request.
+    """
+    if not key:
+        return None, False
+    ensure_indexes(collection)
+    record = collection.find_one({'_id': key})
+    if not record:
+        return None, False
+    if record['fingerprint'] != fingerprint:
+        return None, True
+    return record['response'], False
+
+
+def remember(collection, key, fingerprint, response):
+    """
+    Store the response sent for an Idempotency-Key so retries can replay it.
+    """
+    if not key:
+        return
+    from pymongo.errors import DuplicateKeyError
+
+    ensure_indexes(collection)
+    try:
+        collection.insert_one({
+            '_id': key,
+            'fingerprint': fingerprint,
+            'response': response,
+            'created_at': datetime.utcnow(),
+        })
+    except DuplicateKeyError:
+        # A concurrent retry with the same key got there first; it coalesced
+        # onto the same job, so the stored response is equivalent.
+        pass
+
+
+def claim_inflight(fingerprint, request_id):
+    """
+    Register a job for a request unless an identical one is already running.
+
+    Returns:
+    - tuple: (request_id, is_new). When an identical job is in flight its
+      request_id is returned with is_new False.
+    """
+    with _inflight_lock:
+        existing_request_id = _inflight_jobs.get(fingerprint)
+        if existing_request_id:
+            return existing_request_id, False
+        _inflight_jobs[fingerprint] = request_id
+        return request_id, True
+
+
+def inflight_request_id(fingerprint):
+    """
+    Return the request_id of the running job for an identical request, if any.
+    """
+    with _inflight_lock:
+        return _inflight_jobs.get(fingerprint)
+
+
+def release_inflight(fingerprint):
+    with _inflight_lock:
+        _inflight_jobs.pop(fingerprint, None)
@@ -0,0 +1,140 @@
+# inventory.py
+import hashlib
+import json
+import os
+
+INVENTORY_DIR = os.path.join(os.environ.get('KMS_DATA_DIR', '/kms-volumemount'), 'inventories')
+# Oldest compiled inventories are removed beyond this many files
+INVENTORY_CACHE_MAX_FILES = int(os.environ.get('KMS_INVENTORY_CACHE_MAX_FILES', 256))
+
+CLUSTER_GROUP = 'k8s_cluster'
+SERVERS_GROUP = 'masters'
+AGENTS_GROUP = 'workers'
+
+
+def host_name(ip, host_names=None):
+    """
+    Derive a stable inventory hostname from a node IP, e.g. 10.0.0.1 -> node-10-0-0-1.
+    Nodes listed in host_names ({ip: name}) keep the name they were registered with.
+    """
+    if host_names and ip in host_names:
+        return host_names[ip]
+    return 'node-' + ip.replace('.', '-').replace(':', '-')
+
+
+def legacy_host_names(master_ips, worker_ips):
+    """
+    Positional names (master-1, worker-1, ...) used for clusters created before
+    hostnames were derived from IPs.
+
+    RKE2 registers a node under its inventory hostname, so these clusters must
+    keep them or every node would rejoin as a new Kubernetes and etcd member.
+    """
+    names = {ip: f'master-{i}' for i, ip in enumerate(master_ips, 1)}
+    names.update({ip: f'worker-{i}' for i, ip in enumerate(worker_ips, 1)})
+    return names
+
+
+def compile_inventory(master_ips, worker_ips, group_vars=None, host_vars=None, host_names=None,
+                      group_names=(CLUSTER_GROUP, SERVERS_GROUP, AGENTS_GROUP)):
+    """
+    Build a YAML/JSON inventory for one cluster.
+
+    Parameters:
+    - master_ips (list): Server node IPs; the first one bootstraps the cluster.
+    - worker_ips (list): Agent node IPs.
+    - group_vars (dict): Vars per group name (k8s_cluster, masters, workers).
+    - host_vars (dict): Vars per node IP.
+    - host_names (dict): Pinned inventory hostnames per node IP, see host_name.
+    - group_names (tuple): Names for the cluster, servers and agents groups;
+      group_vars is still keyed by the default names.
+
+    Returns:
+    - dict: Inventory in the structure read by Ansible's yaml inventory plugin.
+    """
+    group_vars = group_vars or {}
+    host_vars = host_vars or {}
+    cluster_group, servers_group, agents_group = group_names
+
+    def hosts(ips, rke2_type):
+        return {
+            host_name(ip, host_names): dict(host_vars.get(ip) or {}, ansible_host=ip, rke2_type=rke2_type)
+            for ip in ips
+        }
+
+    def group(name, content):
+        if group_vars.get(name):
+            content['vars'] = group_vars[name]
+        return content
+
+    return {
+        'all': {
+            'children': {
+                cluster_group: group(CLUSTER_GROUP, {
+                    'children': {
+                        servers_group: group(SERVERS_GROUP, {'hosts': hosts(master_ips, 'server')}),
+                        agents_group: group(AGENTS_GROUP, {'hosts': hosts(worker_ips, 'agent')}),
+                    },
+                }),
+            },
+        },
+    }
+
+
+def _prune_cache():
+    paths = [os.path.join(INVENTORY_DIR, name) for name in os.listdir(INVENTORY_DIR) if name.endswith('.json')]
+    if len(paths) <= INVENTORY_CACHE_MAX_FILES:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - INVENTORY_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_inventory(inventory):
+    """
+    Write a compiled inventory to disk, keyed by the hash of its content.
+
+    An identical inventory compiled earlier is reused as-is, so repeated runs
+    against the same cluster do not rewrite the file.
+
+    Returns:
+    - str: Path of the inventory file.
+    """
+    # Host order is significant (the first master bootstraps), so keys are not sorted
+    content = json.dumps(inventory, indent=2)
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    path = os.path.join(INVENTORY_DIR, f'{digest}.json')
+
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    os.makedirs(INVENTORY_DIR, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as inventory_file:
+        inventory_file.write(content)
+    os.replace(tmp_path, path)
+    _prune_cache()
+    return path
+
+
+def cluster_vars(cluster_info, payload):
+    """
+    Merge group and host vars stored on the cluster record with those sent in a request.
+
+    Returns:
+    - tuple: (group_vars, host_vars), request values taking precedence.
+    """
+    cluster_info = cluster_info or {}
+    group_vars = {}
+    for source in (cluster_info.get('group_vars') or {}, payload.get('group_vars') or {}):
+        for group_name, variables in source.items():
+            group_vars.setdefault(group_name, {}).update(variables or {})
+    host_vars = {}
+    for source in (cluster_info.get('host_vars') or {}, payload.get('host_vars') or {}):
+        for ip, variables in source.items():
+            host_vars.setdefault(ip, {}).update(variables or {})
+    return group_vars, host_vars
@@ -0,0 +1,169 @@
+# joblog.py
+import bisect
+import gzip
+import os
+import time
+
+JOB_LOG_DIR = os.path.join(os.environ.get('KMS_DATA_DIR', '/kms-volumemount'), 'jobs')
+# Uncompressed bytes per gzip member; a read only decompresses the members it overlaps
+CHUNK_SIZE = 64 * 1024
+MAX_AGE_SECONDS = int(os.environ.get('KMS_JOB_LOG_MAX_AGE_DAYS', 14)) * 24 * 3600
+MAX_TOTAL_BYTES = int(os.environ.get('KMS_JOB_LOG_MAX_TOTAL_MB', 512)) * 1024 * 1024
+
+
+def log_path(request_id):
+    return os.path.join(JOB_LOG_DIR, f'{request_id}.log.gz')
+
+
+def index_path(request_id):
+    return os.path.join(JOB_LOG_DIR, f'{request_id}.idx')
+
+
+class JobLogWriter:
+    """
+    Append a job's output as a series of independent gzip members.
+
+    Each member is recorded in a side index as
+    "<uncompressed offset> <compressed offset> <compressed length> <uncompressed length>",
+    so readers can seek straight to the members covering a byte range.
+    """
+
+    def __init__(self, request_id):
+        os.makedirs(JOB_LOG_DIR, exist_ok=True)
+        self.log_file = open(log_path(request_id), 'ab')
+        self.index_file = open(index_path(request_id), 'a')
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= CHUNK_SIZE:
+            self._flush_chunk(bytes(self.buffer[:CHUNK_SIZE]))
+            del self.buffer[:CHUNK_SIZE]
+
+    def _flush_chunk(self, chunk):
+        compressed = gzip.compress(chunk)
+        compressed_offset = self.log_file.tell()
+        self.log_file.write(compressed)
+        self.log_file.flush()
+        # The index line is written after the data so readers never see a partial member
+        self.index_file.write(f'{self.offset} {compressed_offset} {len(compressed)} {len(chunk)}\n')
+        self.index_file.flush()
+        self.offset += len(chunk)
+
+    def close(self):
+        if self.buffer:
+            self._flush_chunk(bytes(self.buffer))
+            self.buffer = bytearray()
+        self.log_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def link_log(request_id, target_request_id):
+    """
+    Make a job's log an alias of another job's log, e.g. the batched run it was part of.
+    """
+    os.makedirs(JOB_LOG_DIR, exist_ok=True)
+    os.symlink(os.path.basename(log_path(target_request_id)), log_path(request_id))
+    os.symlink(os.path.basename(index_path(target_request_id)), index_path(request_id))
+
+
+def unlink_log(request_id):
+    """
+    Remove a job's log alias, leaving the log it pointed to in place.
+    """
+    for path in (log_path(request_id), index_path(request_id)):
+        if os.path.islink(path):
+            os.remove(path)
+
+
+def _load_index(request_id):
+    with open(index_path(request_id)) as index_file:
+        return [tuple(int(field) for field in line.split()) for line in index_file if line.strip()]
+
+
+def log_size(request_id):
+    """
+    Return the uncompressed size of a job log, or None if the job has no log.
+    """
+    try:
+        index = _load_index(request_id)
+    except FileNotFoundError:
+        return None
+    if not index:
+        return 0
+    return index[-1][0] + index[-1][3]
+
+
+def read_range(request_id, offset, length):
+    """
+    Read uncompressed bytes [offset, offset + length) of a job log.
+
+    Parameters:
+    - request_id (str): Job whose log to read.
+    - offset (int): Uncompressed byte offset to start at.
+    - length (int): Maximum number of bytes to return.
+
+    Returns:
+    - bytes: The requested range, shorter if the log ends first.
+    """
+    index = _load_index(request_id)
+    if not index or length <= 0:
+        return b''
+
+    first = max(0, bisect.bisect_right([entry[0] for entry in index], offset) - 1)
+    end = offset + length
+    data = bytearray()
+    with open(log_path(request_id), 'rb') as log_file:
+        for uncompressed_offset, compressed_offset, compressed_length, _ in index[first:]:
+            if uncompressed_offset >= end:
+                break
+            log_file.seek(compressed_offset)
+            chunk = gzip.decompress(log_file.read(compressed_length))
+            start = max(0, offset - uncompressed_offset)
+            data.extend(chunk[start:end - uncompressed_offset])
+    return bytes(data)
+
+
+def read_tail(request_id, length):
+    """
+    Read the last length bytes of a job log.
+    """
+    size = log_size(request_id) or 0
+    return read_range(request_id, max(0, size - length), length)
+
+
+def enforce_retention():
+    """
+    Delete job logs older than the maximum age, then the oldest ones until
+    the archive fits in the total size budget.
+    """
+    if not os.path.isdir(JOB_LOG_DIR):
+        return
+
+    logs = []
+    for file_name in os.listdir(JOB_LOG_DIR):
+        if file_name.endswith('.log.gz'):
+            path = os.path.join(JOB_LOG_DIR, file_name)
+            # lstat: logs linked to a batch log are counted once, and dangling links still expire
+            stat = os.lstat(path)
+            logs.append((stat.st_mtime, stat.st_size, file_name[:-len('.log.gz')]))
+    logs.sort()
+
+    now = time.time()
+    total_bytes = sum(size for _, size, _ in logs)
+    for mtime, size, request_id in logs:
+        if now - mtime <= MAX_AGE_SECONDS and total_bytes <= MAX_TOTAL_BYTES:
+            break
+        for path in (log_path(request_id), index_path(request_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total_bytes -= size
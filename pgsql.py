@@ -1,11 +1,15 @@
 from flask import Flask, request, jsonify, abort
 from flask_cors import CORS
 import psycopg2
+import os
+from contextlib import contextmanager
 import subprocess
 from threading import Thread
 import uuid
 import json
 
+from schema import validate_create_request, validate_cluster_name_request
+
 app = Flask(__name__)
 CORS(app)
 
@@ -16,24 +20,32 @@ latest_valid_request_id = None
 clusters_info = {}
 ansible_playbook_response = None
 
-# Establish connection to your PostgreSQL database
-conn = psycopg2.connect(
-    dbname="admin",
-    user="admin",
-    password="admin",
-    host="localhost",
-    port="5432"
-)
+# PostgreSQL connection settings; connections are opened per call, never at import time
+DB_PARAMS = {
+    'dbname': os.environ.get('POSTGRES_DB', 'admin'),
+    'user': os.environ.get('POSTGRES_USER', 'admin'),
+    'password': os.environ.get('POSTGRES_PASSWORD', 'admin'),
+    'host': os.environ.get('POSTGRES_HOST', 'localhost'),
+    'port': os.environ.get('POSTGRES_PORT', '5432'),
+    'connect_timeout': int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 2)),
+}
+
+@contextmanager
+def connect_db():
+    """
+    Open a connection for one unit of work, ending its transaction and closing it on exit.
+    psycopg2's own connection context manager only ends the transaction.
+    """
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
 
 def save_cluster_info(cluster_name, request_id, master_ips, worker_ips):
     try:
-        with psycopg2.connect(
-            dbname="admin",
-            user="admin",
-            password="admin",
-            host="localhost",
-            port="5432"
-        ) as conn:
+        with connect_db() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     "INSERT INTO clusters (cluster_name, request_id, master_ips, worker_ips) VALUES (%s, %s, %s, %s)",
@@ -46,13 +58,7 @@ def save_cluster_info(cluster_name, request_id, master_ips, worker_ips):
 
 def get_cluster_info(cluster_name):
     try:
-        with psycopg2.connect(
-            dbname="admin",
-            user="admin",
-            password="admin",
-            host="localhost",
-            port="5432"
-        ) as conn:
+        with connect_db() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     "SELECT * FROM clusters WHERE cluster_name = %s",
@@ -97,11 +103,11 @@ def run_ansible_playbook(ansible_command):
 def start_ansible_playbook(ansible_command):
     Thread(target=run_ansible_playbook, args=(ansible_command,)).start()
 
-def validate_ip_addresses(ips):
-    try:
-        return [str(ipaddress.ip_address(ip)) for ip in ips]
-    except ValueError as e:
-        abort(400, jsonify({'status': 'error', 'message': f'Invalid IP address: {str(e)}'}))
+def parse_request(validator):
+    data, errors = validator(request.get_json(silent=True))
+    if errors:
+        return None, (jsonify({'status': 'error', 'message': 'Invalid request payload: ' + '; '.join(errors), 'errors': errors}), 400)
+    return data, None
 
 def create_dynamic_inventory(master_ips, worker_ips):
     try:
@@ -133,13 +139,7 @@ def build_ansible_command(rke2_version, upgrade_required=False):
 
 def get_existing_clusters_with_same_ips(master_ips, worker_ips):
     try:
-        with psycopg2.connect(
-            dbname="admin",
-            user="admin",
-            password="admin",
-            host="localhost",
-            port="5432"
-        ) as conn:
+        with connect_db() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     "SELECT cluster_name, master_ips, worker_ips FROM clusters WHERE master_ips = %s OR worker_ips = %s",
@@ -161,15 +161,14 @@ def cluster_exists(cluster_name, master_ips, worker_ips):
 # API Endpoint for creating clusters
 @app.route('/api/cluster/create', methods=['POST'])
 def create_cluster():
-    rke2_version = request.json.get('rke2_k8s_version', None)
-    master_ips = request.json.get('master_ips', None)
-    worker_ips = request.json.get('worker_ips', [])
-    cluster_name = request.json.get('cluster_name', None)
+    payload, error_response = parse_request(validate_create_request)
+    if error_response:
+        return error_response
 
-    if not rke2_version or not master_ips or not cluster_name:
-        missing_params = ', '.join(param for param, value in {'rke2_k8s_version': rke2_version, 'master_ips': master_ips, 'cluster_name': cluster_name}.items() if not value)
-        error_message = f'Both rke2_k8s_version, master_ips, and cluster_name are required attributes. Please pass the missing parameter(s) in the JSON payload: {missing_params}'
-        return jsonify({'status': 'error', 'message': error_message}), 400
+    rke2_version = payload['rke2_k8s_version']
+    master_ips = payload['master_ips']
+    worker_ips = payload['worker_ips']
+    cluster_name = payload['cluster_name']
 
     # Check if the cluster with the same name and IPs already exists
     if cluster_exists(cluster_name, master_ips, worker_ips):
@@ -190,23 +189,18 @@ def create_cluster():
         return jsonify({'status': 'success', 'message': 'Cluster creation request sent successfully', 'request_id': request_id, 'cluster_name': cluster_name})
 
     except psycopg2.Error as e:
-        conn.rollback()  # Rollback the transaction
         error_message = f"Error creating cluster: {str(e)}"
         return jsonify({'status': 'error', 'message': error_message}), 500
 
-    finally:
-        conn.close()
-        print("PostgreSQL connection is closed")
-
 @app.route('/api/cluster/status', methods=['POST'])
 def get_cluster_status():
     global cluster_creation_status, ansible_playbook_response
 
-    payload = request.json
-    cluster_name = payload.get('cluster_name')
+    payload, error_response = parse_request(validate_cluster_name_request)
+    if error_response:
+        return error_response
 
-    if not cluster_name:
-        return jsonify({'status': 'error', 'message': 'Cluster name not provided in the JSON payload'}), 400
+    cluster_name = payload['cluster_name']
 
     # Retrieve cluster information from your data source (replace with your logic)
     # For example, assume cluster_creation_status and ansible_playbook_response are globally updated elsewhere in the application
@@ -247,11 +241,19 @@ def get_cluster_status():
     return jsonify(status_without_request_id), http_status_code
 
 
-# Close the connection when done
-@app.teardown_appcontext
-def close_connection(exception):
-    conn.close()
-    print("PostgreSQL connection is closed")
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    return jsonify({'status': 'alive'})
+
+@app.route('/healthz/db', methods=['GET'])
+def database_health():
+    try:
+        with connect_db() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        return jsonify({'status': 'ok'})
+    except psycopg2.Error as e:
+        return jsonify({'status': 'unavailable', 'message': str(e)}), 503
 
 
 if __name__ == '__main__':
@@ -0,0 +1,69 @@
+# preflight.py
+import asyncio
+import os
+
+SSH_PORT = 22
+# RKE2 API server and supervisor ports, probed on masters of existing clusters
+SERVER_PORTS = (6443, 9345)
+PREFLIGHT_DEADLINE_SECONDS = float(os.environ.get('KMS_PREFLIGHT_DEADLINE_SECONDS', 3))
+
+
+async def _probe_port(ip, port, read_banner=False):
+    reader, writer = await asyncio.open_connection(ip, port)
+    try:
+        if not read_banner:
+            return 'open'
+        banner = (await reader.readline()).decode(errors='replace').strip()
+        if not banner.startswith('SSH-'):
+            raise ConnectionError(f'unexpected banner {banner[:40]!r}')
+        return banner
+    finally:
+        writer.close()
+
+
+async def _probe_all(probes, deadline):
+    tasks = {asyncio.ensure_future(_probe_port(ip, port, port == SSH_PORT)): (ip, port) for ip, port in probes}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+
+    results = {}
+    for task, (ip, port) in tasks.items():
+        if task in pending:
+            results[(ip, port)] = (False, 'timeout')
+        elif task.exception() is not None:
+            error = task.exception()
+            results[(ip, port)] = (False, str(error) or type(error).__name__)
+        else:
+            results[(ip, port)] = (True, task.result())
+    return results
+
+
+def probe_nodes(ips, server_ips=(), deadline=PREFLIGHT_DEADLINE_SECONDS):
+    """
+    Probe SSH on every node, and the RKE2 server ports on server_ips, concurrently.
+
+    Parameters:
+    - ips (list): Node IPs that must accept SSH.
+    - server_ips (list): Master IPs of a running cluster whose server ports are also checked.
+    - deadline (float): Seconds allowed for the whole probe, not per connection.
+
+    Returns:
+    - dict: ip -> {'reachable': bool, 'ssh': banner or error, 'ports': {'6443': 'open' or error, ...}}.
+      Only SSH decides reachability; server ports are informational. Ports are
+      string keys so the report can be stored in MongoDB with the response.
+    """
+    probes = [(ip, SSH_PORT) for ip in ips] + [(ip, port) for ip in server_ips for port in SERVER_PORTS]
+    results = asyncio.run(_probe_all(probes, deadline)) if probes else {}
+
+    report = {}
+    for ip in ips:
+        reachable, ssh = results[(ip, SSH_PORT)]
+        report[ip] = {'reachable': reachable, 'ssh': ssh}
+    for ip in server_ips:
+        report.setdefault(ip, {'reachable': False, 'ssh': 'not probed'})['ports'] = {
+            str(port): results[(ip, port)][1] for port in SERVER_PORTS
+        }
+    return report
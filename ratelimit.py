@@ -0,0 +1,105 @@
+# ratelimit.py
+import hmac
+import json
+import math
+import os
+import time
+from threading import Lock
+
+# Per-route limits: rate is tokens added per second, burst is the bucket size.
+# Routes with admission enabled are also refused while the job pool is full.
+# Override with KMS_RATE_LIMITS, e.g. '{"/api/cluster/create": {"rate": 1, "burst": 10}}'.
+DEFAULT_ROUTE_LIMITS = {
+    '/api/cluster/create': {'rate': 0.1, 'burst': 5, 'admission': True},
+    '/api/cluster/upgrade': {'rate': 0.1, 'burst': 5, 'admission': True},
+    '/api/cluster/delete': {'rate': 0.1, 'burst': 5, 'admission': True},
+    '/api/cluster/<cluster_name>/nodes': {'rate': 0.1, 'burst': 5, 'admission': True},
+    '*': {'rate': 5, 'burst': 20, 'admission': False},
+}
+
+# Clients presenting one of these X-API-Key values get their own buckets, e.g. 'key1,key2'.
+# Unknown keys are ignored, since anyone can send a new one with every request.
+API_KEYS = [key.strip() for key in os.environ.get('KMS_API_KEYS', '').split(',') if key.strip()]
+
+MAX_ACTIVE_JOBS = int(os.environ.get('KMS_MAX_ACTIVE_JOBS', 4))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('KMS_ADMISSION_RETRY_AFTER_SECONDS', 30))
+
+# Drop idle buckets once this many clients have been seen
+MAX_TRACKED_BUCKETS = 10000
+
+
+def load_route_limits():
+    route_limits = {route: dict(limits) for route, limits in DEFAULT_ROUTE_LIMITS.items()}
+    overrides = json.loads(os.environ.get('KMS_RATE_LIMITS', '{}'))
+    for route, limits in overrides.items():
+        route_limits.setdefault(route, dict(route_limits['*'])).update(limits)
+    return route_limits
+
+
+route_limits = load_route_limits()
+
+# (client, route) -> [tokens, last refill time]
+_buckets = {}
+_buckets_lock = Lock()
+
+
+def is_known_api_key(api_key):
+    return any(hmac.compare_digest(api_key.encode(), known_key.encode()) for known_key in API_KEYS)
+
+
+def limits_for(route):
+    return route_limits.get(route, route_limits['*'])
+
+
+def _prune_buckets(now):
+    for bucket_key, (tokens, updated_at) in list(_buckets.items()):
+        limits = limits_for(bucket_key[1])
+        if tokens + (now - updated_at) * limits['rate'] >= limits['burst']:
+            del _buckets[bucket_key]
+
+
+def take_token(client_id, route):
+    """
+    Take a token from the client's bucket for a route.
+
+    Parameters:
+    - client_id (str): API key or address identifying the caller.
+    - route (str): URL rule of the endpoint being called.
+
+    Returns:
+    - float: 0 when the request may proceed, otherwise the number of
+      seconds until a token becomes available.
+    """
+    limits = limits_for(route)
+    if limits['rate'] <= 0:
+        return 0
+
+    now = time.monotonic()
+    with _buckets_lock:
+        if len(_buckets) > MAX_TRACKED_BUCKETS:
+            _prune_buckets(now)
+
+        tokens, updated_at = _buckets.get((client_id, route), (limits['burst'], now))
+        tokens = min(limits['burst'], tokens + (now - updated_at) * limits['rate'])
+        if tokens < 1:
+            _buckets[(client_id, route)] = [tokens, now]
+            return (1 - tokens) / limits['rate']
+
+        _buckets[(client_id, route)] = [tokens - 1, now]
+        return 0
+
+
+def admit(route, active_jobs):
+    """
+    Decide whether a mutation may start another ansible job.
+
+    Returns:
+    - int: 0 when admitted, otherwise the Retry-After value in seconds.
+    """
+    if not limits_for(route).get('admission') or active_jobs < MAX_ACTIVE_JOBS:
+        return 0
+    return ADMISSION_RETRY_AFTER_SECONDS
+
+
+def retry_after_header(seconds):
+    return str(max(1, math.ceil(seconds)))
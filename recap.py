@@ -0,0 +1,47 @@
+# recap.py
+import re
+
+RECAP_LINE = re.compile(r'^(\S+)\s+:\s+((?:\w+=\d+\s*)+)$')
+TASK_RESULT_LINE = re.compile(r'^(ok|changed|skipping|fatal|failed|unreachable): \[([^\]]+)\]')
+
+
+def parse_play_recap(output):
+    """
+    Parse the PLAY RECAP section of ansible-playbook output.
+
+    Returns:
+    - dict: inventory hostname -> counters (ok, changed, unreachable, failed, ...).
+    """
+    recap_start = output.rfind('PLAY RECAP')
+    if recap_start == -1:
+        return {}
+
+    hosts = {}
+    for line in output[recap_start:].splitlines()[1:]:
+        match = RECAP_LINE.match(line.strip())
+        if match:
+            hosts[match.group(1)] = {
+                key: int(value) for key, value in (field.split('=') for field in match.group(2).split())
+            }
+    return hosts
+
+
+def host_succeeded(counters):
+    """
+    A host succeeded when nothing failed, was unreachable or had to be rescued.
+    """
+    return not any(counters.get(key, 0) for key in ('failed', 'unreachable', 'rescued'))
+
+
+def parse_task_result(line):
+    """
+    Parse a per-host task result line such as "changed: [node-10-0-0-1]".
+
+    Returns:
+    - tuple: (host, result) or None when the line is not a task result.
+    """
+    match = TASK_RESULT_LINE.match(line)
+    if not match:
+        return None
+    # Delegated tasks are reported as "[host -> delegate]"
+    return match.group(2).split(' -> ')[0], match.group(1)
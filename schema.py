@@ -0,0 +1,210 @@
+# schema.py
+import ipaddress
+import re
+
+# Upper bound on how many hosts a single CIDR or range entry may expand to
+MAX_EXPANDED_HOSTS = 1024
+
+CLUSTER_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,99}$')
+
+# reject: fail the request if a node is unreachable, exclude: leave unreachable
+# workers out of the run, skip: do not probe
+PREFLIGHT_MODES = ('reject', 'exclude', 'skip')
+
+
+def _check_string(name, value, max_length=100, pattern=None):
+    if not isinstance(value, str) or not value.strip():
+        return None, [f'{name}: must be a non-empty string']
+    value = value.strip()
+    if len(value) > max_length:
+        return None, [f'{name}: must be at most {max_length} characters']
+    if pattern is not None and not pattern.match(value):
+        return None, [f'{name}: "{value}" contains unsupported characters']
+    return value, []
+
+
+def _check_bool(name, value):
+    if isinstance(value, bool):
+        return value, []
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true', []
+    return None, [f'{name}: must be a boolean']
+
+
+def _check_choice(name, value, choices):
+    if value not in choices:
+        return None, [f'{name}: must be one of {", ".join(choices)}']
+    return value, []
+
+
+def _check_dict(name, value):
+    if not isinstance(value, dict):
+        return None, [f'{name}: must be an object']
+    return value, []
+
+
+def _check_group_vars(name, value):
+    if not isinstance(value, dict):
+        return None, [f'{name}: must be an object of group name to vars']
+    errors = [f'{name}.{group}: must be an object' for group, variables in value.items() if not isinstance(variables, dict)]
+    return value, errors
+
+
+def _check_host_vars(name, value):
+    if not isinstance(value, dict):
+        return None, [f'{name}: must be an object of node IP to vars']
+    host_vars, errors = {}, []
+    for ip, variables in value.items():
+        try:
+            ip = str(ipaddress.ip_address(ip))
+        except ValueError as e:
+            errors.append(f'{name}: {e}')
+            continue
+        if not isinstance(variables, dict):
+            errors.append(f'{name}.{ip}: must be an object')
+            continue
+        host_vars[ip] = variables
+    return host_vars, errors
+
+
+def _expand_ip_entry(entry):
+    """
+    Expand a single IP, CIDR (10.0.0.0/29) or range (10.0.0.5-10.0.0.9) entry.
+
+    Returns:
+    - list: Normalized IP address strings.
+    """
+    if '-' in entry:
+        first, last = (ipaddress.ip_address(part.strip()) for part in entry.split('-', 1))
+        if first.version != last.version or last < first:
+            raise ValueError(f'"{entry}" is not a valid IP range')
+        if int(last) - int(first) + 1 > MAX_EXPANDED_HOSTS:
+            raise ValueError(f'"{entry}" expands to more than {MAX_EXPANDED_HOSTS} addresses')
+        return [str(first + offset) for offset in range(int(last) - int(first) + 1)]
+
+    if '/' in entry:
+        network = ipaddress.ip_network(entry, strict=False)
+        if network.num_addresses > MAX_EXPANDED_HOSTS:
+            raise ValueError(f'"{entry}" expands to more than {MAX_EXPANDED_HOSTS} addresses')
+        # /31, /32 (and /127, /128) have no network/broadcast address to skip
+        hosts = network if network.num_addresses <= 2 else network.hosts()
+        return [str(ip) for ip in hosts]
+
+    return [str(ipaddress.ip_address(entry))]
+
+
+def _check_ip_list(name, value):
+    if not isinstance(value, list):
+        return None, [f'{name}: must be a list of IP addresses, CIDRs or ranges']
+
+    ips, errors = [], []
+    for index, entry in enumerate(value):
+        if not isinstance(entry, str):
+            errors.append(f'{name}[{index}]: must be a string')
+            continue
+        try:
+            ips.extend(_expand_ip_entry(entry.strip()))
+        except ValueError as e:
+            errors.append(f'{name}[{index}]: {e}')
+
+    # Deduplicate while keeping the order the caller gave us
+    return list(dict.fromkeys(ips)), errors
+
+
+FIELD_TYPES = {
+    'string': _check_string,
+    'cluster_name': lambda name, value: _check_string(name, value, pattern=CLUSTER_NAME_PATTERN),
+    'version': lambda name, value: _check_string(name, value, max_length=50),
+    'bool': _check_bool,
+    'preflight': lambda name, value: _check_choice(name, value, PREFLIGHT_MODES),
+    'dict': _check_dict,
+    'group_vars': _check_group_vars,
+    'host_vars': _check_host_vars,
+    'ip_list': _check_ip_list,
+}
+
+
+def compile_schema(fields):
+    """
+    Compile a field specification into a validator function.
+
+    Parameters:
+    - fields (dict): Mapping of field name to (type, required, default).
+
+    Returns:
+    - callable: validator(payload) -> (data, errors). All problems in the
+      payload are reported together in errors; data is None when errors is
+      non-empty.
+    """
+    checks = [(name, FIELD_TYPES[field_type], required, default)
+              for name, (field_type, required, default) in fields.items()]
+    ip_fields = [name for name, (field_type, _, _) in fields.items() if field_type == 'ip_list']
+
+    def validate(payload):
+        if not isinstance(payload, dict):
+            return None, ['request body must be a JSON object']
+
+        data, errors = {}, []
+        for name, check, required, default in checks:
+            value = payload.get(name)
+            if value is None or value == [] or value == '':
+                if required:
+                    errors.append(f'{name}: missing required attribute')
+                else:
+                    data[name] = list(default) if isinstance(default, list) else default
+                continue
+            value, field_errors = check(name, value)
+            errors.extend(field_errors)
+            data[name] = value
+
+        # A node can only take one role in a cluster
+        if len(ip_fields) > 1:
+            seen = {}
+            for name in ip_fields:
+                for ip in data.get(name) or []:
+                    if ip in seen and seen[ip] != name:
+                        errors.append(f'{name}: {ip} is also listed in {seen[ip]}')
+                    seen.setdefault(ip, name)
+
+        if errors:
+            return None, errors
+        return data, []
+
+    return validate
+
+
+validate_create_request = compile_schema({
+    'cluster_name': ('cluster_name', True, None),
+    'rke2_k8s_version': ('version', True, None),
+    'master_ips': ('ip_list', True, None),
+    'worker_ips': ('ip_list', False, []),
+    'group_vars': ('group_vars', False, None),
+    'host_vars': ('host_vars', False, None),
+    'preflight': ('preflight', False, 'reject'),
+})
+
+validate_upgrade_request = compile_schema({
+    'cluster_name': ('cluster_name', True, None),
+    'rke2_k8s_version': ('version', True, None),
+    'master_ips': ('ip_list', True, None),
+    'worker_ips': ('ip_list', False, []),
+    'upgrade_required': ('bool', False, False),
+    'group_vars': ('group_vars', False, None),
+    'host_vars': ('host_vars', False, None),
+    'preflight': ('preflight', False, 'reject'),
+})
+
+# Nodes to tear down come from the stored cluster record
+validate_delete_request = compile_schema({
+    'cluster_name': ('cluster_name', True, None),
+    'preflight': ('preflight', False, 'reject'),
+})
+
+validate_cluster_name_request = compile_schema({
+    'cluster_name': ('cluster_name', True, None),
+})
+
+validate_scale_request = compile_schema({
+    'master_ips': ('ip_list', False, []),
+    'worker_ips': ('ip_list', False, []),
+})
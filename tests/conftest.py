@@ -0,0 +1,8 @@
+# conftest.py
+import os
+import sys
+import tempfile
+
+# Modules are flat files at the repo root and resolve their data paths from KMS_DATA_DIR at import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('KMS_DATA_DIR', tempfile.mkdtemp(prefix='kms-tests-'))
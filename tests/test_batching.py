@@ -0,0 +1,75 @@
+# test_batching.py
+import time
+
+import batching
+
+
+def job(request_id, master_ips, worker_ips=(), host_names=None):
+    return {
+        'request_id': request_id,
+        'cluster_name': f'cluster.{request_id}',
+        'master_ips': list(master_ips),
+        'worker_ips': list(worker_ips),
+        'group_vars': {'k8s_cluster': {'rke2_cni': 'calico'}},
+        'host_vars': {},
+        'host_names': host_names or {},
+        'extra_vars': {'rke2_version': 'v1.28.9+rke2r1'},
+    }
+
+
+def recap_line(host, failed=0, unreachable=0, rescued=0, ignored=0):
+    return f'{host} : ok=5 changed=1 unreachable={unreachable} failed={failed} skipped=0 rescued={rescued} ignored={ignored}\n'
+
+
+def test_compile_batch_gives_each_cluster_its_own_groups_and_play():
+    inventory, playbook = batching.compile_batch([job('a', ['10.0.0.1']), job('b', ['10.0.0.2'], ['10.0.0.3'])])
+
+    cluster_group = inventory['all']['children']['kms1_cluster_b']
+    assert cluster_group['vars']['rke2_servers_group_name'] == 'kms1_cluster_b_masters'
+    assert cluster_group['vars']['rke2_cni'] == 'calico'
+    assert cluster_group['vars']['rke2_version'] == 'v1.28.9+rke2r1'
+    assert list(cluster_group['children']['kms1_cluster_b_workers']['hosts']) == ['node-10-0-0-3']
+
+    assert [play['hosts'] for play in playbook] == ['kms0_cluster_a', 'kms1_cluster_b']
+    assert all(play['gather_facts'] is False and play['ignore_unreachable'] for play in playbook)
+    assert 'rescue' in playbook[0]['tasks'][0]
+
+
+def test_demultiplex():
+    jobs = [job('ok', ['10.0.0.1']), job('rescued', ['10.0.0.2']), job('unreachable', ['10.0.0.3']), job('not-run', ['10.0.0.4'])]
+    output = 'PLAY RECAP ***\n' + recap_line('node-10-0-0-1') + recap_line('node-10-0-0-2', rescued=1) + recap_line('node-10-0-0-3', ignored=1)
+
+    assert batching.demultiplex(jobs, output) == {'ok': True, 'rescued': False, 'unreachable': False, 'not-run': None}
+
+
+def test_demultiplex_uses_pinned_host_names():
+    jobs = [job('legacy', ['10.0.0.1'], host_names={'10.0.0.1': 'master-1'})]
+
+    assert batching.demultiplex(jobs, 'PLAY RECAP ***\n' + recap_line('master-1')) == {'legacy': True}
+
+
+def test_queue_starts_a_new_batch_when_hosts_collide(monkeypatch):
+    monkeypatch.setattr(batching, 'BATCH_WINDOW_SECONDS', 60)
+    batches = []
+    queue = batching.BatchQueue(lambda jobs: batches.append([queued['request_id'] for queued in jobs]))
+
+    queue.submit(job('a', ['10.0.0.1']))
+    queue.submit(job('b', ['10.0.0.2']))
+    # 10.0.0.1 is already in the pending batch, so that batch is sent off first
+    queue.submit(job('c', ['10.0.0.1']))
+    queue.flush()
+
+    deadline = time.monotonic() + 5
+    while len(batches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Each batch runs on its own thread, so they may finish in either order
+    assert sorted(batches) == [['a', 'b'], ['c']]
+
+
+def test_window_of_zero_disables_batching(monkeypatch):
+    monkeypatch.setattr(batching, 'BATCH_WINDOW_SECONDS', 0)
+    assert not batching.is_batchable(['10.0.0.1'], [])
+
+    monkeypatch.setattr(batching, 'BATCH_WINDOW_SECONDS', 2)
+    assert batching.is_batchable(['10.0.0.1'], [])
+    assert not batching.is_batchable(['10.0.0.1'], ['10.0.0.%d' % i for i in range(2, 2 + batching.BATCH_MAX_NODES)])
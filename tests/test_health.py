@@ -0,0 +1,126 @@
+# test_health.py
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import health
+
+
+def node(name, ready, version='v1.28.9+rke2r1'):
+    return {
+        'metadata': {'name': name},
+        'status': {
+            'conditions': [{'type': 'MemoryPressure', 'status': 'False'}, {'type': 'Ready', 'status': 'True' if ready else 'False'}],
+            'nodeInfo': {'kubeletVersion': version},
+        },
+    }
+
+
+class FakeApiServer:
+    """
+    Serve a fixed NodeList on /api/v1/nodes over plain HTTP.
+    """
+
+    def __init__(self, node_list):
+        body = json.dumps(node_list).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/api/v1/nodes':
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def kubeconfigs(tmp_path, monkeypatch):
+    """
+    Point the poller at a temporary kubeconfig directory, reaching each cluster at the URL in its file.
+    """
+    monkeypatch.setattr(health, 'KUBECONFIG_DIR', str(tmp_path))
+    monkeypatch.setattr(health, 'cluster_health', {})
+    monkeypatch.setattr(health, '_backoff', {})
+    # TLS client setup is not under test; the fake API server speaks plain HTTP
+    monkeypatch.setattr(health, '_load_client', lambda path: (open(path).read().strip(), None))
+
+    def add(cluster_name, url):
+        (tmp_path / f'{cluster_name}.yaml').write_text(url)
+
+    return add
+
+
+def test_summarize_nodes():
+    summary = health.summarize_nodes({'items': [node('a', True), node('b', False, 'v1.29.4+rke2r1')]})
+
+    assert summary['status'] == 'degraded'
+    assert (summary['nodes_ready'], summary['nodes_not_ready']) == (1, 1)
+    assert summary['versions'] == ['v1.28.9+rke2r1', 'v1.29.4+rke2r1']
+    assert summary['nodes'][0] == {'name': 'a', 'ready': True, 'version': 'v1.28.9+rke2r1'}
+
+
+def test_summarize_nodes_without_nodes_is_degraded():
+    assert health.summarize_nodes({'items': []})['status'] == 'degraded'
+
+
+def test_poll_once_against_fake_api_server(kubeconfigs):
+    api_server = FakeApiServer({'items': [node('a', True), node('b', True)]})
+    try:
+        kubeconfigs('edge-1', api_server.url)
+        asyncio.run(health.poll_once())
+    finally:
+        api_server.close()
+
+    snapshot = health.get_snapshot('edge-1')
+    assert snapshot['status'] == 'healthy'
+    assert snapshot['nodes_ready'] == 2
+    assert snapshot['checked_at'].endswith('Z')
+
+
+def test_unreachable_cluster_backs_off_and_keeps_last_snapshot(kubeconfigs):
+    api_server = FakeApiServer({'items': [node('a', True)]})
+    kubeconfigs('edge-1', api_server.url)
+    asyncio.run(health.poll_once())
+    api_server.close()
+
+    asyncio.run(health.poll_once())
+    snapshot = health.get_snapshot('edge-1')
+    assert snapshot['status'] == 'unreachable'
+    assert snapshot['consecutive_failures'] == 1
+    # The last good node list is kept next to the error
+    assert snapshot['nodes_ready'] == 1
+
+    # While backing off the cluster is not polled again
+    asyncio.run(health.poll_once())
+    assert health.get_snapshot('edge-1')['consecutive_failures'] == 1
+
+
+def test_forget_drops_kubeconfig_and_snapshot(kubeconfigs, tmp_path):
+    api_server = FakeApiServer({'items': [node('a', True)]})
+    try:
+        kubeconfigs('edge-1', api_server.url)
+        asyncio.run(health.poll_once())
+    finally:
+        api_server.close()
+
+    health.forget('edge-1')
+
+    assert health.get_snapshot('edge-1') is None
+    assert not (tmp_path / 'edge-1.yaml').exists()
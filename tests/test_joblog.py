@@ -0,0 +1,76 @@
+# test_joblog.py
+import os
+import time
+
+import pytest
+
+import joblog
+
+DATA = b''.join(f'line {i:04d} of the ansible output\n'.encode() for i in range(200))
+
+
+@pytest.fixture(autouse=True)
+def job_log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(joblog, 'JOB_LOG_DIR', str(tmp_path))
+    # Small members so every read spans several of them
+    monkeypatch.setattr(joblog, 'CHUNK_SIZE', 100)
+    return tmp_path
+
+
+def write_log(request_id, data=DATA, piece=37):
+    with joblog.JobLogWriter(request_id) as writer:
+        for start in range(0, len(data), piece):
+            writer.write(data[start:start + piece])
+
+
+def test_log_is_indexed_per_chunk():
+    write_log('job')
+
+    assert joblog.log_size('job') == len(DATA)
+    with open(joblog.index_path('job')) as index_file:
+        assert len(index_file.readlines()) == -(-len(DATA) // 100)
+
+
+@pytest.mark.parametrize('offset, length', [(0, 10), (95, 10), (100, 100), (1234, 777), (len(DATA) - 5, 100), (len(DATA) + 10, 5)])
+def test_read_range_matches_the_written_bytes(offset, length):
+    write_log('job')
+
+    assert joblog.read_range('job', offset, length) == DATA[offset:offset + length]
+
+
+def test_read_tail():
+    write_log('job')
+
+    assert joblog.read_tail('job', 250) == DATA[-250:]
+    assert joblog.read_tail('job', len(DATA) * 2) == DATA
+
+
+def test_missing_and_empty_logs():
+    assert joblog.log_size('missing') is None
+    write_log('empty', b'')
+    assert joblog.log_size('empty') == 0
+    assert joblog.read_tail('empty', 10) == b''
+
+
+def test_linked_log_reads_the_target_until_unlinked():
+    write_log('batch-1')
+    joblog.link_log('job', 'batch-1')
+
+    assert joblog.read_tail('job', 50) == DATA[-50:]
+
+    joblog.unlink_log('job')
+    assert joblog.log_size('job') is None
+    assert joblog.log_size('batch-1') == len(DATA)
+
+
+def test_retention_removes_old_logs_first(monkeypatch):
+    write_log('old')
+    write_log('new')
+    old_mtime = time.time() - 3600
+    os.utime(joblog.log_path('old'), (old_mtime, old_mtime))
+    monkeypatch.setattr(joblog, 'MAX_TOTAL_BYTES', os.path.getsize(joblog.log_path('new')))
+
+    joblog.enforce_retention()
+
+    assert joblog.log_size('old') is None
+    assert joblog.log_size('new') == len(DATA)
@@ -0,0 +1,102 @@
+# test_preflight.py
+import socket
+import threading
+
+import pytest
+
+import preflight
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+class FakeNode:
+    """
+    Listen on a loopback address and greet every connection with a fixed banner.
+    """
+
+    def __init__(self, ip, port, banner=None):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((ip, port))
+        self.server.listen()
+        self.banner = banner
+        self.connections = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(connection)
+            if self.banner is not None:
+                connection.sendall(self.banner)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.server.close()
+
+
+@pytest.fixture
+def ssh_port(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(preflight, 'SSH_PORT', port)
+    return port
+
+
+@pytest.fixture
+def nodes():
+    started = []
+
+    def start(ip, port, banner=None):
+        started.append(FakeNode(ip, port, banner))
+
+    yield start
+    for node in started:
+        node.close()
+
+
+def test_ssh_banner_makes_node_reachable(ssh_port, nodes):
+    nodes('127.0.0.1', ssh_port, b'SSH-2.0-OpenSSH_9.6\r\n')
+
+    report = preflight.probe_nodes(['127.0.0.1'], deadline=2)
+
+    assert report['127.0.0.1'] == {'reachable': True, 'ssh': 'SSH-2.0-OpenSSH_9.6'}
+
+
+def test_unreachable_nodes_report_why(ssh_port, nodes):
+    nodes('127.0.0.2', ssh_port, b'HTTP/1.1 400 Bad Request\r\n')
+    nodes('127.0.0.4', ssh_port)
+
+    report = preflight.probe_nodes(['127.0.0.2', '127.0.0.3', '127.0.0.4'], deadline=0.5)
+
+    assert report['127.0.0.2']['reachable'] is False
+    assert 'unexpected banner' in report['127.0.0.2']['ssh']
+    # Nothing listens on 127.0.0.3, so the connection is refused
+    assert report['127.0.0.3']['reachable'] is False
+    # 127.0.0.4 accepts but never sends a banner, so it runs into the overall deadline
+    assert report['127.0.0.4'] == {'reachable': False, 'ssh': 'timeout'}
+
+
+def test_server_ports_are_reported_with_string_keys(ssh_port, nodes, monkeypatch):
+    api_port, supervisor_port = free_port(), free_port()
+    monkeypatch.setattr(preflight, 'SERVER_PORTS', (api_port, supervisor_port))
+    nodes('127.0.0.1', ssh_port, b'SSH-2.0-test\r\n')
+    nodes('127.0.0.1', api_port)
+
+    report = preflight.probe_nodes(['127.0.0.1'], server_ips=['127.0.0.1'], deadline=2)
+
+    assert report['127.0.0.1']['reachable'] is True
+    assert report['127.0.0.1']['ports'][str(api_port)] == 'open'
+    assert report['127.0.0.1']['ports'][str(supervisor_port)] != 'open'
+    assert all(isinstance(port, str) for port in report['127.0.0.1']['ports'])
+
+
+def test_no_nodes_probes_nothing():
+    assert preflight.probe_nodes([]) == {}
@@ -0,0 +1,49 @@
+# test_recap.py
+import recap
+
+OUTPUT = """
+TASK [Uninstall RKE2] **********************************************************
+changed: [node-10-0-0-1]
+fatal: [node-10-0-0-2]: UNREACHABLE! => {"changed": false, "unreachable": true}
+ok: [node-10-0-0-3 -> node-10-0-0-1]
+
+PLAY RECAP *********************************************************************
+node-10-0-0-1              : ok=3    changed=1    unreachable=0    failed=0    skipped=0    rescued=0    ignored=0
+node-10-0-0-2              : ok=0    changed=0    unreachable=1    failed=0    skipped=0    rescued=0    ignored=0
+node-10-0-0-3              : ok=2    changed=0    unreachable=0    failed=0    skipped=1    rescued=1    ignored=0
+"""
+
+
+def test_parse_play_recap():
+    hosts = recap.parse_play_recap(OUTPUT)
+
+    assert set(hosts) == {'node-10-0-0-1', 'node-10-0-0-2', 'node-10-0-0-3'}
+    assert hosts['node-10-0-0-1']['changed'] == 1
+    assert hosts['node-10-0-0-2']['unreachable'] == 1
+
+
+def test_parse_play_recap_uses_the_last_recap():
+    output = 'PLAY RECAP ***\nold-host : ok=1 failed=1\n' + OUTPUT
+
+    assert 'old-host' not in recap.parse_play_recap(output)
+
+
+def test_parse_play_recap_without_recap():
+    assert recap.parse_play_recap('ERROR! the playbook could not be found') == {}
+
+
+def test_host_succeeded():
+    hosts = recap.parse_play_recap(OUTPUT)
+
+    assert recap.host_succeeded(hosts['node-10-0-0-1'])
+    assert not recap.host_succeeded(hosts['node-10-0-0-2'])
+    # A rescued host did not complete the work
+    assert not recap.host_succeeded(hosts['node-10-0-0-3'])
+
+
+def test_parse_task_result():
+    assert recap.parse_task_result('changed: [node-10-0-0-1]\n') == ('node-10-0-0-1', 'changed')
+    assert recap.parse_task_result('fatal: [node-10-0-0-2]: UNREACHABLE! => {}') == ('node-10-0-0-2', 'fatal')
+    # Delegated results are attributed to the host the task ran for
+    assert recap.parse_task_result('ok: [node-10-0-0-3 -> node-10-0-0-1]') == ('node-10-0-0-3', 'ok')
+    assert recap.parse_task_result('TASK [Uninstall RKE2] ****') is None
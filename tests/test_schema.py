@@ -0,0 +1,82 @@
+# test_schema.py
+import pytest
+
+from schema import (
+    MAX_EXPANDED_HOSTS,
+    validate_create_request,
+    validate_delete_request,
+    validate_scale_request,
+    validate_upgrade_request,
+)
+
+CREATE = {'cluster_name': 'edge-1', 'rke2_k8s_version': 'v1.28.9+rke2r1', 'master_ips': ['10.0.0.1']}
+
+
+def test_valid_create_request_gets_defaults():
+    data, errors = validate_create_request(CREATE)
+
+    assert errors == []
+    assert data['worker_ips'] == []
+    assert data['preflight'] == 'reject'
+
+
+def test_every_problem_is_reported_together():
+    data, errors = validate_create_request({'cluster_name': '-bad name', 'master_ips': ['10.0.0.300'], 'preflight': 'maybe'})
+
+    assert data is None
+    assert any(error.startswith('cluster_name:') for error in errors)
+    assert 'rke2_k8s_version: missing required attribute' in errors
+    assert any(error.startswith('master_ips[0]:') for error in errors)
+    assert any(error.startswith('preflight:') for error in errors)
+
+
+def test_non_object_body_is_rejected():
+    assert validate_create_request(None) == (None, ['request body must be a JSON object'])
+
+
+def test_cidrs_and_ranges_are_expanded_and_deduplicated():
+    data, errors = validate_create_request(dict(CREATE, worker_ips=['10.0.1.0/30', '10.0.1.2-10.0.1.4', '10.0.1.4']))
+
+    assert errors == []
+    assert data['worker_ips'] == ['10.0.1.1', '10.0.1.2', '10.0.1.3', '10.0.1.4']
+
+
+@pytest.mark.parametrize('entry', ['10.0.0.0/8', '10.0.0.1-10.255.0.0'])
+def test_expansion_is_capped(entry):
+    data, errors = validate_create_request(dict(CREATE, worker_ips=[entry]))
+
+    assert data is None
+    assert str(MAX_EXPANDED_HOSTS) in errors[0]
+
+
+def test_node_cannot_be_master_and_worker():
+    data, errors = validate_create_request(dict(CREATE, worker_ips=['10.0.0.0/31']))
+
+    assert data is None
+    assert errors == ['worker_ips: 10.0.0.1 is also listed in master_ips']
+
+
+@pytest.mark.parametrize('value, expected', [(True, True), ('true', True), (' False ', False)])
+def test_upgrade_required_accepts_booleans(value, expected):
+    data, errors = validate_upgrade_request(dict(CREATE, upgrade_required=value))
+
+    assert errors == []
+    assert data['upgrade_required'] is expected
+
+
+def test_upgrade_required_rejects_other_values():
+    assert validate_upgrade_request(dict(CREATE, upgrade_required='yes'))[1] == ['upgrade_required: must be a boolean']
+
+
+def test_host_vars_are_keyed_by_normalized_ip():
+    data, errors = validate_create_request(dict(CREATE, host_vars={'10.000.0.1': {'a': 1}}))
+    assert 'host_vars' in errors[0]
+
+    data, errors = validate_create_request(dict(CREATE, host_vars={'10.0.0.1': {'a': 1}}, group_vars={'masters': 'x'}))
+    assert errors == ['group_vars.masters: must be an object']
+
+
+def test_delete_and_scale_requests():
+    assert validate_delete_request({'cluster_name': 'edge-1'})[0] == {'cluster_name': 'edge-1', 'preflight': 'reject'}
+    # Both lists are optional in the schema; the handlers reject requests that name no nodes
+    assert validate_scale_request({})[0] == {'master_ips': [], 'worker_ips': []}